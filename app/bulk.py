@@ -0,0 +1,65 @@
+"""Parsing and validation of bulk uploads.
+
+Uploads are a JSON array or NDJSON (one object per line). Rows are numbered
+from 0 in upload order and every rejected row is reported with its number
+instead of failing the whole upload.
+"""
+import json
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from starlette import status
+
+from app.schemas import CoreModel
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+
+class RowError(CoreModel):
+    row: int
+    detail: str
+
+
+class BulkImportResult(CoreModel):
+    received: int
+    inserted: int
+    errors: List[RowError]
+
+
+def parse_rows(body: bytes, content_type: str) -> Tuple[List[Tuple[int, object]], List[RowError]]:
+    """Numbered rows of a JSON array or NDJSON ``body``, and the NDJSON lines that are not JSON."""
+    if content_type.split(";")[0].strip() in NDJSON_MEDIA_TYPES:
+        rows, errors = [], []
+        for number, line in enumerate(line for line in body.splitlines() if line.strip()):
+            try:
+                rows.append((number, json.loads(line)))
+            except ValueError as error:
+                errors.append(RowError(row=number, detail=f"Invalid JSON: {error}"))
+        return rows, errors
+    try:
+        rows = json.loads(body)
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {error}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of rows.")
+    return list(enumerate(rows)), []
+
+
+def validate_rows(schema: Type[BaseModel], rows: Iterable[Tuple[int, object]]) \
+        -> Tuple[List[Tuple[int, BaseModel]], List[RowError]]:
+    valid, errors = [], []
+    for number, row in rows:
+        try:
+            valid.append((number, schema.parse_obj(row)))
+        except ValidationError as error:
+            errors.append(RowError(row=number, detail="; ".join(
+                f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())))
+    return valid, errors
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
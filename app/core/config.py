@@ -1,8 +1,13 @@
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import AnyHttpUrl, BaseSettings, PostgresDsn, validator
 
 
+def async_database_uri(uri: str) -> str:
+    scheme, _, rest = uri.partition("://")
+    return f"{scheme.split('+')[0]}+asyncpg://{rest}"
+
+
 class Settings(BaseSettings):
     PROJECT_NAME: str
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
@@ -33,12 +38,54 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or 'cartwheel'}",
         )
 
+    ASYNC_DATABASE_URI: Optional[str] = None
+
+    @validator("ASYNC_DATABASE_URI", pre=True)
+    def assemble_async_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
+        if isinstance(v, str):
+            return v
+        return async_database_uri(str(values.get("DATABASE_URI")))
+
+    # Per engine and worker, see ``app.core.pool``
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_PRE_PING: Literal["always", "idle", "never"] = "idle"
+    DATABASE_PRE_PING_IDLE: float = 30
+    DATABASE_PGBOUNCER: bool = False
+
+    # A JSON list in the environment, read-only routes balance across them, see ``app.core.replicas``
+    REPLICA_DATABASE_URIS: List[str] = []
+
+    @validator("REPLICA_DATABASE_URIS", pre=True)
+    def assemble_replica_connections(cls, v: Union[str, List[str]]) -> List[str]:
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        return v
+
+    ASYNC_REPLICA_DATABASE_URIS: List[str] = []
+
+    @validator("ASYNC_REPLICA_DATABASE_URIS", pre=True, always=True)
+    def assemble_async_replica_connections(cls, v: Union[str, List[str]], values: Dict[str, Any]) -> List[str]:
+        if v:
+            return cls.assemble_replica_connections(v)
+        return [async_database_uri(uri) for uri in values.get("REPLICA_DATABASE_URIS", [])]
+
+    REPLICA_STICKY_SECONDS: int = 10
+    REPLICA_STICKY_COOKIE: str = "read_primary_until"
+
     JWT_SETTINGS: Optional[Dict[str, Any]] = None
     SECRET_KEY: str
     JWT_ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     JWT_TOKEN_PREFIX: str
     JWT_AUDIENCE: str
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL: int = 60
+    PASSWORD_HASHER_EXECUTOR: str = "process"
+    PASSWORD_HASHER_WORKERS: int = 2
+    PASSWORD_HASHER_MAX_PENDING: int = 64
 
     @validator('JWT_SETTINGS', pre=True)
     def assemble_jwt_settings(cls, v: Optional[str], values: Dict[str, Any]) -> Dict[str, Any]:
@@ -53,8 +100,27 @@ class Settings(BaseSettings):
         }
 
     TIME_SLOT_MINUTES = 15
+    AVAILABILITY_INDEX_SIZE: int = 10000
+    AVAILABILITY_INDEX_TTL: int = 30
+    AVAILABILITY_MAX_DAYS: int = 31
+    TABLE_ALLOCATOR_TTL: int = 60
+    METADATA_REGISTRY_TTL: int = 60
+    AVAILABILITY_CACHE_TTL: int = 300
+    AVAILABILITY_CACHE_SIZE: int = 10000
+    BEST_TABLE_ATTEMPTS: int = 3
+    BULK_IMPORT_CHUNK_SIZE: int = 1000
+    EXPORT_BATCH_SIZE: int = 1000
+    RESERVATION_PARTITIONS_AHEAD: int = 3
+    RESERVATION_RETENTION_MONTHS: int = 24
+    RESERVATION_ARCHIVE_SCHEMA: str = "archive"
+    QUERY_BUDGET: int = 20
+    QUERY_REPEAT_LIMIT: int = 5
 
     REDIS_URL: str = "redis://redis:6379"
+    REDIS_PREFIX: str = "myapi-cache"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_CONNECT_TIMEOUT: float = 1.0
 
     class Config:
         case_sensitive = True
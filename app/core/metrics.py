@@ -0,0 +1,175 @@
+"""Prometheus metrics, served by ``/metrics``.
+
+``MetricsMiddleware`` times every request by route template and collects the
+queries it runs through the engine events installed by ``instrument_engine``.
+When PROMETHEUS_MULTIPROC_DIR is set (gunicorn with several workers), metrics
+are aggregated over all workers of the host.
+"""
+import logging
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, \
+    generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+from app.core.config import settings
+from app.core.queries import QueryStats, current_query_stats
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency by route template.",
+                            ["method", "route", "status"])
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being served.", ["method", "route"],
+                           multiprocess_mode="livesum")
+QUERY_DURATION = Histogram("db_query_duration_seconds", "Duration of single SQL statements.",
+                           buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+REQUEST_QUERIES = Histogram("db_queries_per_request", "SQL statements run by a request.", ["method", "route"],
+                            buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100))
+REQUEST_QUERY_TIME = Histogram("db_time_per_request_seconds", "Time a request spent in SQL statements.",
+                               ["method", "route"])
+POOL_CHECKOUT = Histogram("db_pool_checkout_seconds", "Time to get a connection from the pool, including connects.",
+                          ["pool"], buckets=(.0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5, 30))
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after DATABASE_POOL_TIMEOUT.", ["pool"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"])
+FLAGGED_REQUESTS = Counter("db_flagged_requests_total",
+                           "Requests over the query budget or repeating statements, see the warning log.",
+                           ["method", "route"])
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def instrument_engine(engine):
+    """Times every statement of a sync ``Engine``, pass ``async_engine.sync_engine`` for async ones."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        QUERY_DURATION.observe(duration)
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record(statement, parameters, duration)
+
+
+class PoolStats:
+    """Checkouts of one pool in this worker, served by ``/pools``."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.overflow_checkouts = 0
+        self.max_overflow_used = 0
+        self.timeouts = 0
+
+    def record(self, wait: float, overflow: int):
+        self.checkouts += 1
+        self.wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        if overflow > 0:
+            self.overflow_checkouts += 1
+            self.max_overflow_used = max(self.max_overflow_used, overflow)
+
+
+class _TimedCheckout:
+    pool_name = "sync"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            POOL_TIMEOUTS.labels(self.pool_name).inc()
+            raise
+        finally:
+            POOL_CHECKOUT.labels(self.pool_name).observe(time.perf_counter() - started)
+        # Connections over ``pool_size`` are overflow, ``NullPool`` has no size
+        self.stats.record(time.perf_counter() - started, self.overflow() if isinstance(self, QueuePool) else 0)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pool_name = "async"
+
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+class TimedAsyncNullPool(_TimedCheckout, NullPool):
+    pool_name = "async"
+
+
+def route_template(scope) -> str:
+    # Templates rather than raw paths keep the number of label values bounded
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, route = scope["method"], route_template(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(method, route, status).observe(time.perf_counter() - started)
+            REQUEST_QUERIES.labels(method, route).observe(stats.count)
+            REQUEST_QUERY_TIME.labels(method, route).observe(stats.duration)
+            current_query_stats.reset(token)
+            problems = stats.problems(settings.QUERY_BUDGET, settings.QUERY_REPEAT_LIMIT)
+            if problems:
+                FLAGGED_REQUESTS.labels(method, route).inc()
+                logger.warning("%s %s: %s", method, route, "; ".join(problems))
+
+
+def metrics(request: Request) -> Response:
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,85 @@
+"""Connection pool settings of the engines in ``app.database``.
+
+Every worker process has its own pools, so Postgres needs at least
+``workers * (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW)`` connections per
+engine. Behind PgBouncer set ``DATABASE_PGBOUNCER``: PgBouncer does the pooling
+and every checkout opens a fresh connection to it. The mode turns off the
+prepared statement caches of asyncpg and SQLAlchemy, but the asyncpg dialect of
+SQLAlchemy 1.4 still prepares every statement under a name. In transaction
+pooling mode that name can already exist on the server connection PgBouncer
+picks. So transaction pooling needs PgBouncer 1.21 or later with
+``max_prepared_statements`` set (100 is plenty), which tracks prepared
+statements across server connections. Older versions need session pooling.
+The mode has not been verified against a live PgBouncer.
+
+``DATABASE_PRE_PING`` chooses when a connection is tested before use: on every
+checkout, only after it sat in the pool for ``DATABASE_PRE_PING_IDLE`` seconds,
+or never, relying on ``DATABASE_POOL_RECYCLE``.
+"""
+import os
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DisconnectionError
+
+from app.core.config import Settings, settings
+from app.core.metrics import TimedAsyncAdaptedQueuePool, TimedAsyncNullPool, TimedNullPool, TimedQueuePool
+
+
+def engine_options(is_async: bool, config: Settings = settings) -> dict:
+    """Keyword arguments of ``create_engine`` or ``create_async_engine``."""
+    if config.DATABASE_PGBOUNCER:
+        options = {"poolclass": TimedAsyncNullPool if is_async else TimedNullPool}
+        if is_async:
+            # Only disables caching, statements are still prepared, see above
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": config.DATABASE_POOL_SIZE,
+        "max_overflow": config.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": config.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": config.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": config.DATABASE_PRE_PING == "always",
+    }
+
+
+def ping_idle_connections(engine: Engine, idle: float):
+    """Tests connections that sat in the pool for over ``idle`` seconds when they are checked out.
+
+    A failed test makes the pool retry with a new connection. Pass
+    ``async_engine.sync_engine`` for async engines.
+    """
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle:
+            return
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except engine.dialect.dbapi.Error as error:
+            raise DisconnectionError() from error
+
+
+def pool_status(engine: Engine) -> dict:
+    pool = engine.pool
+    status = {"pool": type(pool).__name__, "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None}
+    if hasattr(pool, "size"):
+        status.update(size=pool.size(), overflow=max(pool.overflow(), 0), checked_in=pool.checkedin())
+    if hasattr(pool, "stats"):
+        status.update(vars(pool.stats))
+    return status
+
+
+def describe_pools(engines: Dict[str, Engine]) -> dict:
+    """Status and checkout statistics of the pools of this worker."""
+    return {"pid": os.getpid(), "pools": {name: pool_status(engine) for name, engine in engines.items()}}
@@ -0,0 +1,93 @@
+"""Per-request SQL statement accounting and query budgets.
+
+The engines behind ``SessionLocal`` and ``AsyncSessionLocal`` report every
+statement to the ``QueryStats`` of the current request (see
+``app.core.metrics``). Statements run more than once with the same parameters
+are pure waste; the same statement with different parameters run many times is
+the N+1 pattern.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+
+
+class QueryStats:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.calls = Counter()
+
+    def record(self, statement: str, parameters, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+        self.calls[(statement, repr(parameters))] += 1
+
+    def repeated(self) -> List[str]:
+        """Statements that ran more than once with identical parameters."""
+        return [statement for (statement, _), times in self.calls.items() if times > 1]
+
+    def problems(self, budget: int, repeat_limit: int) -> List[str]:
+        problems = []
+        if self.count > budget:
+            problems.append(f"{self.count} statements over the budget of {budget}")
+        for statement in dict.fromkeys(self.repeated()):
+            problems.append(f"identical statement repeated: {statement}")
+        for statement, times in self.statements.items():
+            if times > repeat_limit:
+                problems.append(f"statement ran {times} times, likely N+1: {statement}")
+        return problems
+
+    def report(self) -> str:
+        return "\n".join(f"{times:>4} x {statement}" for statement, times in self.statements.most_common())
+
+
+# Statements of the request being served, shared with the threadpool and run_sync greenlets
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+@contextmanager
+def count_queries(engine=None) -> Iterator[QueryStats]:
+    """Collects the statements run inside the block.
+
+    With an ``engine`` every statement it runs is counted, from any thread or
+    request, which is what tests driving the app through a client need.
+    Without one, only statements of the current context are counted.
+    """
+    stats = QueryStats()
+    if engine is None:
+        token = current_query_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            current_query_stats.reset(token)
+        return
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_budget_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats.record(statement, parameters, time.perf_counter() - context._query_budget_started)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield stats
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", after_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(limit: int, engine=None, allow_repeats: bool = False) -> Iterator[QueryStats]:
+    """Fails when the block runs more than ``limit`` statements or, unless allowed, repeats one."""
+    with count_queries(engine) as stats:
+        yield stats
+    assert stats.count <= limit, f"{stats.count} statements ran, the budget is {limit}:\n{stats.report()}"
+    assert allow_repeats or not stats.repeated(), f"Identical statements repeated:\n{stats.report()}"
@@ -1,12 +1,66 @@
-"""Redis client module."""
+"""Redis client module.
 
-from typing import AsyncIterator
+One pooled async client per worker is created at startup, stored on
+``app.state.redis`` and injected with ``app.dependencies.get_redis``. The
+helpers below batch commands into single round trips and treat an unreachable
+or slow Redis as a cache miss.
+"""
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
 
-from aioredis import create_redis_pool, Redis
+from fastapi.encoders import jsonable_encoder
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
+from app.core.config import settings
 
-async def init_redis_pool(host: str, password: str) -> AsyncIterator[Redis]:
-    pool = await create_redis_pool(f"redis://{host}", password=password)
-    yield pool
-    pool.close()
-    await pool.wait_closed()
+logger = logging.getLogger(__name__)
+
+
+def create_redis(url: str = settings.REDIS_URL) -> Redis:
+    return Redis.from_url(
+        url,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=30,
+    )
+
+
+def cache_key(key: str) -> str:
+    return f"{settings.REDIS_PREFIX}:{key}"
+
+
+async def get_json_many(redis: Redis, keys: Iterable[str]) -> List[Optional[Any]]:
+    """Values of ``keys`` fetched with one MGET, ``None`` for missing keys."""
+    keys = [cache_key(key) for key in keys]
+    if not keys:
+        return []
+    try:
+        values = await redis.mget(keys)
+    except (RedisError, OSError) as error:
+        logger.warning("Redis read failed: %s", error)
+        return [None] * len(keys)
+    return [json.loads(value) if value is not None else None for value in values]
+
+
+async def get_json(redis: Redis, key: str) -> Optional[Any]:
+    return (await get_json_many(redis, [key]))[0]
+
+
+async def set_json_many(redis: Redis, values: Dict[str, Any], ttl: int):
+    """Stores every value with a ``ttl`` in seconds in one pipelined round trip."""
+    if not values:
+        return
+    pipeline = redis.pipeline(transaction=False)
+    for key, value in values.items():
+        pipeline.set(cache_key(key), json.dumps(jsonable_encoder(value)), ex=ttl)
+    try:
+        await pipeline.execute()
+    except (RedisError, OSError) as error:
+        logger.warning("Redis write failed: %s", error)
+
+
+async def set_json(redis: Redis, key: str, value: Any, ttl: int):
+    await set_json_many(redis, {key: value}, ttl)
@@ -0,0 +1,75 @@
+"""Read replica routing.
+
+Routes that only read take their session from
+``app.dependencies.get_async_read_db``, which is what marks them replica-safe.
+Their sessions are spread round robin over the ``REPLICA_DATABASE_URIS``
+engines, every other route keeps using the primary.
+
+Replicas lag behind the primary, so a client that just wrote could read its
+own write back as missing. After a successful write request the middleware sets
+a cookie that sends the client's replica-safe requests to the primary for
+``REPLICA_STICKY_SECONDS``. Without replicas everything goes to the primary and
+no cookie is set.
+
+The slot, availability and next-available calculations only read too, but they
+fill caches shared by every client, so they take
+``app.dependencies.get_async_primary_read_db`` and stay on the primary.
+"""
+import itertools
+import time as timer
+from typing import Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReplicaSet:
+
+    def __init__(self, sessionmakers: Sequence[sessionmaker]):
+        self.sessionmakers = list(sessionmakers)
+        self._counter = itertools.count()
+
+    def __bool__(self):
+        return bool(self.sessionmakers)
+
+    def session(self) -> AsyncSession:
+        return self.sessionmakers[next(self._counter) % len(self.sessionmakers)]()
+
+
+def reads_primary(connection: HTTPConnection) -> bool:
+    """Whether the client wrote within the last ``REPLICA_STICKY_SECONDS``."""
+    try:
+        return float(connection.cookies.get(settings.REPLICA_STICKY_COOKIE, 0)) > timer.time()
+    except ValueError:
+        return False
+
+
+class ReplicaStickinessMiddleware:
+    """Sets the read-your-writes cookie on successful responses to writes that went to the primary."""
+
+    def __init__(self, app, replicas: ReplicaSet):
+        self.app = app
+        self.replicas = replicas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS or not self.replicas:
+            await self.app(scope, receive, send)
+            return
+        # Shared with ``request.state`` of the endpoint, where the read session dependencies mark the request
+        state = scope.setdefault("state", {})
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 \
+                    and not state.get("read_only"):
+                until = timer.time() + settings.REPLICA_STICKY_SECONDS
+                cookie = f"{settings.REPLICA_STICKY_COOKIE}={until:.3f}; Max-Age={settings.REPLICA_STICKY_SECONDS}; " \
+                         f"Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -1,12 +1,42 @@
+from typing import Dict
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import as_declarative
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.pool import engine_options, ping_idle_connections
+from app.core.replicas import ReplicaSet
 
-engine = create_engine(settings.DATABASE_URI, pool_pre_ping=True)
+engine = create_engine(settings.DATABASE_URI, **engine_options(is_async=False))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URI, **engine_options(is_async=True))
+AsyncSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine,
+                                 class_=AsyncSession)
+
+replica_engines = [create_async_engine(uri, **engine_options(is_async=True))
+                   for uri in settings.ASYNC_REPLICA_DATABASE_URIS]
+replicas = ReplicaSet([sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=replica_engine,
+                                    class_=AsyncSession) for replica_engine in replica_engines])
+
+
+def database_engines() -> Dict[str, Engine]:
+    """Every engine of the worker by name, the async ones as their sync engine."""
+    engines = {"sync": engine, "async": async_engine.sync_engine}
+    engines.update({f"replica-{index}": replica_engine.sync_engine
+                    for index, replica_engine in enumerate(replica_engines)})
+    return engines
+
+
+for _engine in database_engines().values():
+    instrument_engine(_engine)
+    if settings.DATABASE_PRE_PING == "idle" and not settings.DATABASE_PGBOUNCER:
+        ping_idle_connections(_engine, settings.DATABASE_PRE_PING_IDLE)
+
 
 @as_declarative()
 class Base:
@@ -1,7 +1,10 @@
+from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import SessionLocal
+from app.core.replicas import reads_primary
+from app.database import AsyncSessionLocal, SessionLocal, replicas
 
 
 def get_db():
@@ -12,5 +15,39 @@ def get_db():
         db.close()
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request, primary: AsyncSession = Depends(get_async_db)):
+    """Session of replica-safe routes, on a replica unless the client just wrote.
+
+    ``primary`` is only opened when it is used, it is a dependency so that
+    overrides of ``get_async_db`` apply to both.
+    """
+    request.state.read_only = True
+    if not replicas or reads_primary(request):
+        yield primary
+        return
+    async with replicas.session() as db:
+        yield db
+
+
+async def get_async_primary_read_db(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Session of read-only routes that fill the shared caches, always on the primary.
+
+    A lagging replica would put its state into the Redis availability cache, the
+    availability index and the metadata registry, which serve every client, so
+    the read-your-writes cookie of the writer doesn't help. The request still
+    counts as a read and doesn't set the cookie.
+    """
+    request.state.read_only = True
+    yield db
+
+
+def get_redis(request: Request) -> Redis:
+    return request.app.state.redis
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
\ No newline at end of file
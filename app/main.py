@@ -1,14 +1,27 @@
-from fastapi import FastAPI, Request, Response, APIRouter
-from sqlalchemy.orm import Session
+import logging
+
+from fastapi import FastAPI, APIRouter
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_redis_cache import FastApiRedisCache
 
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, metrics
+from app.core.pool import describe_pools
+from app.core.redis import create_redis
+from app.core.replicas import ReplicaStickinessMiddleware
+from app.database import database_engines, replicas
 from users.api.v1 import router as user_router
+from users.hashing import password_hasher
 from restaurant_management.api.v1 import router as restaurant_router
 from reservation.api.v1 import router as reservation_router
 
+logger = logging.getLogger(__name__)
+
+
+def pools() -> dict:
+    """Pools of the worker serving the request, unlike ``/metrics`` which sums up every worker."""
+    return describe_pools(database_engines())
+
 
 def get_application():
     _app = FastAPI(title=settings.PROJECT_NAME)
@@ -20,6 +33,10 @@ def get_application():
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    _app.add_middleware(ReplicaStickinessMiddleware, replicas=replicas)
+    _app.add_middleware(MetricsMiddleware)
+    _app.add_api_route("/metrics", metrics, include_in_schema=False)
+    _app.add_api_route("/pools", pools, include_in_schema=False)
 
     return _app
 
@@ -28,14 +45,15 @@ app = get_application()
 
 
 @app.on_event("startup")
-def startup():
-    redis_cache = FastApiRedisCache()
-    redis_cache.init(
-        host_url=settings.REDIS_URL,
-        prefix="myapi-cache",
-        response_header="X-MyAPI-Cache",
-        ignore_arg_types=[Request, Response, Session]
-    )
+async def startup():
+    app.state.redis = create_redis()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.redis.close()
+    password_hasher.shutdown()
+    logger.info("Connection pools at shutdown: %s", describe_pools(database_engines()))
 
 
 router = APIRouter()
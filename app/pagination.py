@@ -0,0 +1,83 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi import HTTPException
+from pydantic.generics import GenericModel
+from sqlalchemy import and_, asc, desc, or_
+from sqlalchemy.orm import Query, Session
+from starlette import status
+
+T = TypeVar("T")
+
+
+class CursorPage(GenericModel, Generic[T]):
+    items: List[T]
+    size: int
+    next_cursor: Optional[str]
+    estimated_total: Optional[int]
+
+
+def encode_cursor(values: Sequence) -> str:
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(columns):
+            raise ValueError(values)
+        return [datetime.fromisoformat(value) if column.type.python_type is datetime else column.type.python_type(value)
+                for column, value in zip(columns, values)]
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor.",
+        )
+
+
+def _after(columns: Sequence, values: Sequence, descending: bool):
+    # Row value comparison (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y)
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+def paginate_by_keyset(query: Query, columns: Sequence, size: int, cursor: str = None,
+                       descending: bool = False) -> Tuple[list, Optional[str]]:
+    """Fetches the page after ``cursor`` ordered by ``columns``, which must identify a row uniquely.
+
+    Only ``size + 1`` rows are read; the extra row tells whether there is a next page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        # The plain bound on the leading column is implied by the row comparison, but unlike the OR it can be used
+        # for index range scans and partition pruning
+        leading = columns[0] <= values[0] if descending else columns[0] >= values[0]
+        query = query.filter(leading, _after(columns, values, descending))
+    ordering = [desc(column) if descending else asc(column) for column in columns]
+    items = query.order_by(*ordering).limit(size + 1).all()
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns])
+    return items, next_cursor
+
+
+def estimate_count(query: Query, db: Session) -> Optional[int]:
+    """Planner row estimate for ``query``, only available on Postgres."""
+    connection = db.connection()
+    if connection.dialect.name != "postgresql":
+        return None
+    compiled = query.statement.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup) if compiled.positional \
+        else compiled.params
+    plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
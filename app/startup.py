@@ -0,0 +1,111 @@
+"""Container boot helpers, run by ``entry.sh``.
+
+``migrate`` compares the revision stored in ``alembic_version`` with the heads
+of the migration scripts and only runs ``alembic upgrade head`` when they
+differ, so a boot with an up to date schema skips loading ``migrations/env.py``
+and every model module::
+
+    python -m app.startup migrate
+    python -m app.startup report
+
+``report`` measures the cold import of ``app.main`` and the startup handlers,
+and lists the packages that take longest to import according to
+``python -X importtime``.
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Set, Tuple
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    return Config(str(ALEMBIC_INI))
+
+
+def head_revisions() -> Set[str]:
+    from alembic.script import ScriptDirectory
+
+    return set(ScriptDirectory.from_config(alembic_config()).get_heads())
+
+
+def database_revisions(connection: Connection) -> Set[str]:
+    if not inspect(connection).has_table("alembic_version"):
+        return set()
+    return set(connection.execute(text("SELECT version_num FROM alembic_version")).scalars())
+
+
+def migrate() -> bool:
+    """Upgrades the database to head unless it is there already, returns whether it ran the migrations."""
+    engine = create_engine(settings.DATABASE_URI, poolclass=NullPool)
+    try:
+        with engine.connect() as connection:
+            if database_revisions(connection) == head_revisions():
+                return False
+    finally:
+        engine.dispose()
+    from alembic import command
+
+    command.upgrade(alembic_config(), "head")
+    return True
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """(module, self, cumulative) microseconds of every module imported by ``module`` in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                            text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.append((name.strip(), int(own), int(cumulative)))
+    return times
+
+
+def report(top: int = 15):
+    started = time.perf_counter()
+    from app.main import app
+
+    imported = time.perf_counter()
+    asyncio.run(app.router.startup())
+    ready = time.perf_counter()
+    asyncio.run(app.router.shutdown())
+    print(f"import app.main: {(imported - started) * 1000:.0f} ms, "
+          f"startup handlers: {(ready - imported) * 1000:.0f} ms")
+
+    by_package = Counter()
+    for name, own, _ in import_times("app.main"):
+        by_package[name.split(".")[0]] += own
+    print("Slowest packages to import, -X importtime:")
+    for package, own in by_package.most_common(top):
+        print(f"{package:<30}{own / 1000:>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["migrate", "report"])
+    args = parser.parse_args()
+    if args.command == "migrate":
+        started = time.perf_counter()
+        ran = migrate()
+        print(f"{'Migrated to' if ran else 'Schema already at'} head in {time.perf_counter() - started:.2f}s")
+    else:
+        report()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 from fastapi import HTTPException
-from fastapi_redis_cache import FastApiRedisCache
-from fastapi_redis_cache.util import deserialize_json
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 
@@ -14,16 +13,11 @@ def get_model_or_404(klass, id: int, db):
     return model_object
 
 
-redis_cache = FastApiRedisCache()
-
-
-def add_to_cache(key: str, values: dict, ttl=3600):
-    return redis_cache.add_to_cache(key, values, ttl)
-
-
-def get_from_cache(key: str):
-    _, in_cache = redis_cache.check_cache(key)
-    if in_cache:
-        return deserialize_json(in_cache)
+async def run_in_session(db: AsyncSession, function, *args, **kwargs):
+    """Runs sync-session code such as the crud functions on the connection of an async session.
 
+    ``function`` is called with the session as its ``db`` keyword argument. Its
+    queries are awaited on the event loop instead of blocking a thread.
+    """
+    return await db.run_sync(lambda session: function(*args, db=session, **kwargs))
 
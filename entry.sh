@@ -1,4 +1,6 @@
 #!/bin/bash -e
-poetry run alembic upgrade head
+# Poetry installs into the image's interpreter, plain python skips starting poetry on every boot
+python -m app.startup migrate
+python -m reservation.partitions create
 
 exec $@
@@ -0,0 +1,28 @@
+"""reservation lookup indexes
+
+Revision ID: 3c1f9a7d2b4e
+Revises: e278a8fafd38
+Create Date: 2026-10-18 09:12:41.524318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a7d2b4e'
+down_revision = 'e278a8fafd38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_reservations_table_id_start_time', 'reservations', ['table_id', 'start_time'], unique=False)
+    op.create_index('ix_reservations_start_time', 'reservations', ['start_time'], unique=False)
+    op.create_index(op.f('ix_tables_restaurant_id'), 'tables', ['restaurant_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tables_restaurant_id'), table_name='tables')
+    op.drop_index('ix_reservations_start_time', table_name='reservations')
+    op.drop_index('ix_reservations_table_id_start_time', table_name='reservations')
@@ -0,0 +1,33 @@
+"""reservation slot constraints
+
+Revision ID: 8d2e61c4a9f0
+Revises: 3c1f9a7d2b4e
+Create Date: 2026-10-18 11:40:03.187554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e61c4a9f0'
+down_revision = '3c1f9a7d2b4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_reservations_table_id_start_time', table_name='reservations')
+    op.create_index('ix_reservations_table_id_start_time', 'reservations', ['table_id', 'start_time'], unique=True)
+    if op.get_bind().dialect.name == 'postgresql':
+        # Rejects overlapping reservations of a table even when they are not aligned on the slot grid
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute('ALTER TABLE reservations ADD CONSTRAINT reservations_no_overlap '
+                   'EXCLUDE USING gist (table_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE reservations DROP CONSTRAINT reservations_no_overlap')
+    op.drop_index('ix_reservations_table_id_start_time', table_name='reservations')
+    op.create_index('ix_reservations_table_id_start_time', 'reservations', ['table_id', 'start_time'], unique=False)
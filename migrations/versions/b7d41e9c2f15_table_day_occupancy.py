@@ -0,0 +1,39 @@
+"""table day occupancy
+
+Revision ID: b7d41e9c2f15
+Revises: 8d2e61c4a9f0
+Create Date: 2026-10-18 15:02:37.640913
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41e9c2f15'
+down_revision = '8d2e61c4a9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('table_day_occupancy',
+    sa.Column('table_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('slots', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['table_id'], ['tables.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('table_id', 'day')
+    )
+    # Availability is read from this table only from now on, so existing reservations are backfilled in the
+    # migration's transaction. The session joins it, the batch commits don't end it.
+    if context.is_offline_mode():
+        op.execute('-- Backfill table_day_occupancy with: python -m reservation.rebuild_occupancy')
+        return
+    from reservation.rebuild_occupancy import rebuild_occupancy
+
+    rebuild_occupancy(Session(bind=op.get_bind()))
+
+
+def downgrade() -> None:
+    op.drop_table('table_day_occupancy')
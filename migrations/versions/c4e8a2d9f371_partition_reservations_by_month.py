@@ -0,0 +1,122 @@
+"""partition reservations by month
+
+Revision ID: c4e8a2d9f371
+Revises: b7d41e9c2f15
+Create Date: 2026-10-18 16:21:09.512083
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2d9f371'
+down_revision = 'b7d41e9c2f15'
+branch_labels = None
+depends_on = None
+
+# Creates the partition of the month of ``month`` unless it exists, moving the rows it covers out of the default
+# partition. Partitioned tables can't have the overlap exclusion constraint, so each partition gets its own.
+CREATE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_reservation_partition(month date) RETURNS boolean AS $$
+DECLARE
+    first_day date := date_trunc('month', month)::date;
+    next_day date := (date_trunc('month', month) + interval '1 month')::date;
+    partition_name text := 'reservations_y' || to_char(first_day, 'YYYY') || 'm' || to_char(first_day, 'MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE reservations INCLUDING DEFAULTS)', partition_name);
+    EXECUTE format('WITH moved AS (DELETE FROM reservations_default WHERE start_time >= %L AND start_time < %L '
+                   'RETURNING *) INSERT INTO %I SELECT * FROM moved', first_day, next_day, partition_name);
+    EXECUTE format('ALTER TABLE reservations ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, first_day, next_day);
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist '
+                   '(table_id WITH =, tsrange(start_time, end_time) WITH &&)', partition_name,
+                   partition_name || '_no_overlap');
+    RETURN true;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('ALTER TABLE reservations DROP CONSTRAINT reservations_no_overlap')
+    op.execute('ALTER TABLE reservations RENAME TO reservations_unpartitioned')
+    op.execute('ALTER TABLE reservations_unpartitioned RENAME CONSTRAINT reservations_pkey '
+               'TO reservations_unpartitioned_pkey')
+    for index in ('ix_reservations_id', 'ix_reservations_table_id_start_time', 'ix_reservations_start_time'):
+        op.execute(f'ALTER INDEX {index} RENAME TO {index}_unpartitioned')
+    op.execute('ALTER SEQUENCE reservations_id_seq OWNED BY NONE')
+
+    # The partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE reservations (
+            id integer NOT NULL DEFAULT nextval('reservations_id_seq'),
+            main_guest_name varchar,
+            number_of_customers integer,
+            table_id integer REFERENCES tables (id),
+            start_time timestamp without time zone NOT NULL,
+            end_time timestamp without time zone,
+            PRIMARY KEY (id, start_time)
+        ) PARTITION BY RANGE (start_time)
+    """)
+    op.create_index('ix_reservations_id', 'reservations', ['id'], unique=False)
+    op.create_index('ix_reservations_table_id_start_time', 'reservations', ['table_id', 'start_time'], unique=True)
+    op.create_index('ix_reservations_start_time', 'reservations', ['start_time'], unique=False)
+    # Catches bookings beyond the created months, ``python -m reservation.partitions`` moves them out
+    op.execute('CREATE TABLE reservations_default PARTITION OF reservations DEFAULT')
+    op.execute('ALTER TABLE reservations_default ADD CONSTRAINT reservations_default_no_overlap '
+               'EXCLUDE USING gist (table_id WITH =, tsrange(start_time, end_time) WITH &&)')
+    op.execute(CREATE_PARTITION_FUNCTION)
+
+    # As far ahead as ``python -m reservation.partitions`` keeps them
+    op.execute(f"""
+        SELECT create_reservation_partition(month::date) FROM generate_series(
+            (SELECT date_trunc('month', coalesce(min(start_time), now())) FROM reservations_unpartitioned),
+            date_trunc('month', now()) + interval '{int(settings.RESERVATION_PARTITIONS_AHEAD)} months',
+            interval '1 month'
+        ) AS month
+    """)
+    op.execute('INSERT INTO reservations (id, main_guest_name, number_of_customers, table_id, start_time, end_time) '
+               'SELECT id, main_guest_name, number_of_customers, table_id, start_time, end_time '
+               'FROM reservations_unpartitioned')
+    op.execute('DROP TABLE reservations_unpartitioned')
+    op.execute('ALTER SEQUENCE reservations_id_seq OWNED BY reservations.id')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Archived partitions are detached and stay where the archival job moved them
+    op.execute('ALTER TABLE reservations RENAME TO reservations_partitioned')
+    op.execute('ALTER TABLE reservations_partitioned RENAME CONSTRAINT reservations_pkey '
+               'TO reservations_partitioned_pkey')
+    for index in ('ix_reservations_id', 'ix_reservations_table_id_start_time', 'ix_reservations_start_time'):
+        op.execute(f'ALTER INDEX {index} RENAME TO {index}_partitioned')
+    op.execute('ALTER SEQUENCE reservations_id_seq OWNED BY NONE')
+    op.create_table('reservations',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('reservations_id_seq')"), nullable=False),
+    sa.Column('main_guest_name', sa.String(), nullable=True),
+    sa.Column('number_of_customers', sa.Integer(), nullable=True),
+    sa.Column('table_id', sa.Integer(), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=True),
+    sa.Column('end_time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['table_id'], ['tables.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO reservations SELECT id, main_guest_name, number_of_customers, table_id, start_time, '
+               'end_time FROM reservations_partitioned')
+    op.execute('DROP TABLE reservations_partitioned')
+    op.execute('DROP FUNCTION create_reservation_partition(date)')
+    op.execute('ALTER SEQUENCE reservations_id_seq OWNED BY reservations.id')
+    op.create_index('ix_reservations_id', 'reservations', ['id'], unique=False)
+    op.create_index('ix_reservations_table_id_start_time', 'reservations', ['table_id', 'start_time'], unique=True)
+    op.create_index('ix_reservations_start_time', 'reservations', ['start_time'], unique=False)
+    op.execute('ALTER TABLE reservations ADD CONSTRAINT reservations_no_overlap '
+               'EXCLUDE USING gist (table_id WITH =, tsrange(start_time, end_time) WITH &&)')
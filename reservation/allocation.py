@@ -0,0 +1,90 @@
+"""Best-fit table allocation.
+
+Each restaurant's tables are kept in buckets by seat count. A request for a
+party is served by bisecting to the smallest bucket that fits and walking up
+the buckets until a table that is free for the requested slot is found, with
+occupancy read from the availability index one bucket at a time.
+"""
+import threading
+import time as timer
+from bisect import bisect_left
+from datetime import datetime
+from itertools import chain
+from typing import Collection, Dict, Iterator, List
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from reservation.availability import availability_index, span_mask
+from restaurant_management.registry import TableInfo, metadata_registry
+
+
+class RestaurantTables:
+
+    def __init__(self, tables: List[TableInfo]):
+        self.buckets: Dict[int, List[int]] = {}
+        for table in sorted(tables, key=lambda table: (table.number_of_seats, table.id)):
+            self.buckets.setdefault(table.number_of_seats, []).append(table.id)
+        self.seat_sizes = sorted(self.buckets)
+        self.loaded_at = timer.monotonic()
+
+    def fitting(self, party_size: int, max_seats: int = None) -> Iterator[List[int]]:
+        """Buckets of the tables seating ``party_size`` (and fewer than ``max_seats``), smallest first."""
+        for size in self.seat_sizes[bisect_left(self.seat_sizes, party_size):]:
+            if max_seats and size >= max_seats:
+                return
+            yield self.buckets[size]
+
+
+class TableAllocator:
+    """Per-worker registry of restaurant table buckets.
+
+    Buckets are loaded lazily, dropped by the table write paths and reloaded
+    after ``ttl`` seconds to pick up changes made by other workers.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._restaurants: Dict[int, RestaurantTables] = {}
+        self._lock = threading.Lock()
+
+    def tables(self, restaurant_id: int, db: Session) -> RestaurantTables:
+        with self._lock:
+            tables = self._restaurants.get(restaurant_id)
+        if tables and timer.monotonic() - tables.loaded_at < self.ttl:
+            return tables
+        tables = RestaurantTables(metadata_registry.tables(restaurant_id, db))
+        with self._lock:
+            self._restaurants[restaurant_id] = tables
+        return tables
+
+    def invalidate(self, restaurant_id: int = None):
+        with self._lock:
+            if restaurant_id is None:
+                self._restaurants.clear()
+            else:
+                self._restaurants.pop(restaurant_id, None)
+
+    def free_tables(self, restaurant_id: int, party_size: int, start: datetime, end: datetime, db: Session,
+                    max_seats: int = None, limit: int = None, exclude: Collection[int] = ()) -> List[int]:
+        """Ids of the tables that fit the party and are free for ``[start, end)``, best fit first.
+
+        The walk stops at the bucket where ``limit`` free tables are found, so
+        larger tables are neither read nor loaded into the index.
+        """
+        buckets = self.tables(restaurant_id, db).fitting(party_size, max_seats)
+        if not limit:
+            # Every bucket is needed, their missing occupancy is read with one query
+            buckets = [list(chain.from_iterable(buckets))]
+        requested = span_mask(start, end)
+        free = []
+        for bucket in buckets:
+            candidates = [table_id for table_id in bucket if table_id not in exclude]
+            occupancy = availability_index.get_many(candidates, start.date(), db)
+            free.extend(table_id for table_id in candidates if not occupancy[table_id] & requested)
+            if limit and len(free) >= limit:
+                return free[:limit]
+        return free
+
+
+table_allocator = TableAllocator(settings.TABLE_ALLOCATOR_TTL)
@@ -1,19 +1,27 @@
 from datetime import datetime, timedelta
 from typing import List, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi_pagination import Page, add_pagination, paginate
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from app.dependencies import get_db
-from app.utils import get_model_or_404
+from app.bulk import BulkImportResult, parse_rows, validate_rows
+from app.core.config import settings
+from app.dependencies import get_async_db, get_async_primary_read_db, get_async_read_db, get_redis
+from app.pagination import CursorPage
+from app.utils import get_model_or_404, run_in_session
 from reservation import schemas, utils
-from reservation.crud import get_reservations_by_restaurant_id
+from reservation.availability import is_bookable, iter_slots, opening_mask
+from reservation.availability_cache import CACHE_HEADER, availability_cache, invalidate_table_day, \
+    invalidate_table_days, restaurant_metadata_version, restaurant_version, table_day_version
+from reservation.export import MEDIA_TYPES, export_reservations, export_statement
 import reservation.crud as reservation_crud
+from reservation.allocation import table_allocator
 from reservation.models import Reservation
-from reservation.utils import get_table_available_slots, TimeSlot
-from restaurant_management.models import Table
+from restaurant_management.registry import get_restaurant_or_404, metadata_registry
 from users.roles import ADMIN_ROLE, EMPLOYEE_ROLE
 
 router = APIRouter(prefix="/v1/reservations",
@@ -21,77 +29,213 @@ router = APIRouter(prefix="/v1/reservations",
                    )
 
 
-@router.get("{restaurant_id}/", response_model=Page[schemas.ReservationDetailsSchema],
+@router.get("{restaurant_id}/", response_model=CursorPage[schemas.ReservationDetailsSchema],
             dependencies=[Depends(ADMIN_ROLE)])
-def get_reservations(restaurant_id: int, start: Union[datetime, None] = Query(default=None),
-                     end: Union[datetime, None] = Query(default=None),
-                     table_id: Union[int, None] = Query(default=None),
-                     db: Session = Depends(get_db)
-
-                     ):
-    return paginate(get_reservations_by_restaurant_id(restaurant_id, db, start, end, table_id))
-
-
-@router.get("{restaurant_id}/today", response_model=Page[schemas.ReservationDetailsSchema],
+async def get_reservations(restaurant_id: int, start: Union[datetime, None] = Query(default=None),
+                           end: Union[datetime, None] = Query(default=None),
+                           table_id: Union[int, None] = Query(default=None),
+                           order: Union[str, None] = Query(default='asc'),
+                           cursor: Union[str, None] = Query(default=None),
+                           size: int = Query(default=50, ge=1, le=100),
+                           estimate: bool = Query(default=False),
+                           db: AsyncSession = Depends(get_async_read_db)
+
+                           ):
+    return await run_in_session(db, reservation_crud.get_reservations_page, restaurant_id, start_time=start,
+                                end_time=end, table_id=table_id, order=order, cursor=cursor, size=size,
+                                estimate=estimate)
+
+
+@router.get("{restaurant_id}/today", response_model=CursorPage[schemas.ReservationDetailsSchema],
             dependencies=[Depends(EMPLOYEE_ROLE)])
-def get_today_reservations(restaurant_id: int, order: Union[str, None] = Query(default='asc'),
-                           db: Session = Depends(get_db)):
-    return paginate(get_reservations_by_restaurant_id(restaurant_id, db, datetime.today(),
-                                                      datetime.now() + timedelta(days=1), order=order))
+async def get_today_reservations(restaurant_id: int, order: Union[str, None] = Query(default='asc'),
+                                 cursor: Union[str, None] = Query(default=None),
+                                 size: int = Query(default=50, ge=1, le=100),
+                                 estimate: bool = Query(default=False),
+                                 db: AsyncSession = Depends(get_async_read_db)):
+    return await run_in_session(db, reservation_crud.get_reservations_page, restaurant_id,
+                                start_time=datetime.today(), end_time=datetime.now() + timedelta(days=1),
+                                order=order, cursor=cursor, size=size, estimate=estimate)
+
+
+@router.get("{restaurant_id}/export", dependencies=[Depends(ADMIN_ROLE)],
+            description="Streams the reservations of the restaurant as NDJSON or CSV, optionally gzip compressed.")
+async def export_restaurant_reservations(restaurant_id: int, start: Union[datetime, None] = Query(default=None),
+                                         end: Union[datetime, None] = Query(default=None),
+                                         table_id: Union[int, None] = Query(default=None),
+                                         format: str = Query(default="ndjson", regex="^(ndjson|csv)$"),
+                                         gzip: bool = Query(default=False),
+                                         db: AsyncSession = Depends(get_async_read_db)):
+    headers = {"Content-Disposition": f'attachment; filename="reservations-{restaurant_id}.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    # The session dependency stays open until the response has been streamed
+    return StreamingResponse(export_reservations(db, export_statement(restaurant_id, start, end, table_id), format,
+                                                 settings.EXPORT_BATCH_SIZE, compress=gzip),
+                             media_type=MEDIA_TYPES[format], headers=headers)
 
 
 @router.post("/", response_model=schemas.ReservationDetailsSchema, status_code=status.HTTP_201_CREATED,
              dependencies=[Depends(EMPLOYEE_ROLE)])
-def create_reservation(reservation_request: schemas.CreateReservationSchema, db: Session = Depends(get_db)):
-    table = get_model_or_404(Table, reservation_request.table_id, db)
+async def create_reservation(reservation_request: schemas.CreateReservationSchema,
+                             db: AsyncSession = Depends(get_async_db), redis: Redis = Depends(get_redis)):
+    table_and_restaurant = await run_in_session(db, metadata_registry.table_with_restaurant,
+                                                reservation_request.table_id)
+    if not table_and_restaurant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Object with id: {reservation_request.table_id} does not exist.",
+        )
+    table, restaurant = table_and_restaurant
 
-    better_allocations = reservation_crud.get_tables_with_better_allocation(table,
-                                                                            reservation_request.start_time,
-                                                                            reservation_request.end_time,
-                                                                            reservation_request.number_of_customers, db)
+    better_allocations = list(await run_in_session(db, table_allocator.free_tables, restaurant.id,
+                                                   reservation_request.number_of_customers,
+                                                   reservation_request.start_time, reservation_request.end_time,
+                                                   max_seats=table.number_of_seats))
     if better_allocations:
-        tables_number = [str(table.id) + ',' for table in better_allocations]
+        tables_number = [str(table_id) + ',' for table_id in better_allocations]
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"There are better allocation options for this reservation check tables: {tables_number}",
         )
 
-    available_time_slots = get_table_available_slots(table.id, reservation_request.start_time, db)
-    time_slot = TimeSlot(reservation_request.start_time.replace(tzinfo=None),
-                         reservation_request.end_time.replace(tzinfo=None))
-    if time_slot not in available_time_slots:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Time slot is not available.",
-        )
     if table.number_of_seats < reservation_request.number_of_customers:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Table seats are not enough.",
         )
 
-    return reservation_crud.create_reservation(reservation_request, db)
+    reservation = await run_in_session(db, reservation_crud.book_reservation, reservation_request, restaurant)
+    if not reservation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Time slot is not available.",
+        )
+    await invalidate_table_day(redis, restaurant.id, reservation.table_id, reservation.start_time.date())
+    return reservation
+
+
+@router.post("/bulk", response_model=BulkImportResult, dependencies=[Depends(ADMIN_ROLE)],
+             description="Imports a JSON array or NDJSON upload of reservations, reporting rejected rows. "
+                         "Targets 10,000 rows/s on Postgres.")
+async def bulk_create_reservations(request: Request, db: AsyncSession = Depends(get_async_db),
+                                   redis: Redis = Depends(get_redis)):
+    rows, errors = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    reservations, invalid = validate_rows(schemas.CreateReservationSchema, rows)
+    inserted, rejected, table_days = await run_in_session(db, reservation_crud.bulk_create_reservations,
+                                                          reservations, chunk_size=settings.BULK_IMPORT_CHUNK_SIZE)
+    await invalidate_table_days(redis, table_days)
+    return BulkImportResult(received=len(rows) + len(errors), inserted=inserted,
+                            errors=sorted(errors + invalid + rejected, key=lambda error: error.row))
+
+
+@router.post("{restaurant_id}/best-table", response_model=schemas.ReservationDetailsSchema,
+             status_code=status.HTTP_201_CREATED, dependencies=[Depends(EMPLOYEE_ROLE)])
+async def book_best_table(restaurant_id: int, reservation_request: schemas.BookBestTableSchema,
+                          db: AsyncSession = Depends(get_async_db), redis: Redis = Depends(get_redis)):
+    restaurant = await run_in_session(db, get_restaurant_or_404, restaurant_id)
+    # Outside the opening hours or off the slot grid no table can be booked, the occupancy doesn't matter
+    if not is_bookable(opening_mask(restaurant.open_hour, restaurant.close_hour),
+                       reservation_request.start_time.replace(tzinfo=None),
+                       reservation_request.end_time.replace(tzinfo=None)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No table is available for this reservation.",
+        )
+    taken = set()
+    for _ in range(settings.BEST_TABLE_ATTEMPTS):
+        free_tables = await run_in_session(db, table_allocator.free_tables, restaurant.id,
+                                           reservation_request.number_of_customers, reservation_request.start_time,
+                                           reservation_request.end_time, limit=1, exclude=taken)
+        if not free_tables:
+            break
+        table_id = free_tables[0]
+        reservation = await run_in_session(
+            db, reservation_crud.book_reservation,
+            schemas.CreateReservationSchema.construct(**reservation_request.dict(), table_id=table_id), restaurant)
+        if reservation:
+            await invalidate_table_day(redis, restaurant.id, table_id, reservation.start_time.date())
+            return reservation
+        # A failed booking means a concurrent request took the table, fall through to the next best one
+        taken.add(table_id)
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"No table is available for this reservation.",
+    )
 
 
 @router.delete("/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(ADMIN_ROLE)])
-def delete_reservation(reservation_id: int, db: Session = Depends(get_db)):
-    reservation = get_model_or_404(Reservation, reservation_id, db)
+async def delete_reservation(reservation_id: int, db: AsyncSession = Depends(get_async_db),
+                             redis: Redis = Depends(get_redis)):
+    reservation = await run_in_session(db, get_model_or_404, Reservation, reservation_id)
     if reservation.start_time < datetime.now():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Cannot delete reservation in the past.",
         )
-    reservation_crud.delete_reservation_by_id(reservation_id, db)
+    table = await run_in_session(db, metadata_registry.table, reservation.table_id)
+    await run_in_session(db, reservation_crud.delete_reservation_by_id, reservation_id)
+    await invalidate_table_day(redis, table.restaurant_id, table.id, reservation.start_time.date())
 
 
 @router.post("{restaurant_id}/tables/{table_id}", response_model=List[schemas.TimeSlotSchema],
              dependencies=[Depends(EMPLOYEE_ROLE)])
-def calculate_table_time_slots(restaurant_id: int, table_id: int,
-                               calculate_time_slot_request: schemas.CalculateTimeSlot,
-                               db: Session = Depends(get_db)):
-    table = get_model_or_404(Table, table_id, db)
-    time_slots = utils.get_table_available_slots(table.id, calculate_time_slot_request.date, db)
-    return time_slots
+async def calculate_table_time_slots(restaurant_id: int, table_id: int,
+                                     calculate_time_slot_request: schemas.CalculateTimeSlot, response: Response,
+                                     db: AsyncSession = Depends(get_async_primary_read_db),
+                                     redis: Redis = Depends(get_redis)):
+    table_and_restaurant = await run_in_session(db, metadata_registry.table_with_restaurant, table_id)
+    if not table_and_restaurant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Object with id: {table_id} does not exist.",
+        )
+    table, _ = table_and_restaurant
+    day = calculate_time_slot_request.date.date()
+
+    async def compute():
+        # Misses read the database, the worker's index may not have seen other workers' bookings yet.
+        # The table and restaurant are already in the session, so only the reservations are queried.
+        return await run_in_session(db, utils.get_table_available_slots, table.id, calculate_time_slot_request.date,
+                                    refresh=True)
 
+    # The opening hours come from the restaurant
+    time_slots, hit = await availability_cache.get_or_compute(
+        redis, f"availability:table:{table.id}:{day.isoformat()}",
+        [table_day_version(table.id, day), restaurant_metadata_version(table.restaurant_id)], compute)
+    response.headers[CACHE_HEADER] = "Hit" if hit else "Miss"
+    return utils.to_time_slots(day, iter_slots(time_slots))
 
-add_pagination(router)
+
+@router.post("{restaurant_id}/availability", response_model=List[schemas.DayAvailabilitySchema],
+             dependencies=[Depends(EMPLOYEE_ROLE)])
+async def calculate_restaurant_availability(restaurant_id: int,
+                                            availability_request: schemas.CalculateRestaurantAvailability,
+                                            response: Response, db: AsyncSession = Depends(get_async_primary_read_db),
+                                            redis: Redis = Depends(get_redis)):
+    restaurant = await run_in_session(db, get_restaurant_or_404, restaurant_id)
+    days = (availability_request.end_date - availability_request.start_date).days + 1
+
+    async def compute():
+        return jsonable_encoder(await run_in_session(db, utils.get_restaurant_availability, restaurant,
+                                                     availability_request.start_date, days,
+                                                     party_size=availability_request.party_size))
+
+    # v2: slot indexes per table and day rather than serialized time slots, see ``utils.expand_availability``
+    key = f"availability:v2:restaurant:{restaurant.id}:{availability_request.start_date.isoformat()}:{days}:" \
+          f"{availability_request.party_size}"
+    availability, hit = await availability_cache.get_or_compute(redis, key, [restaurant_version(restaurant.id)],
+                                                                compute)
+    response.headers[CACHE_HEADER] = "Hit" if hit else "Miss"
+    return utils.expand_availability(availability)
+
+
+@router.post("{restaurant_id}/next-available", response_model=List[schemas.NextAvailableSlotSchema],
+             dependencies=[Depends(EMPLOYEE_ROLE)],
+             description="The first bookable (table, slot) pairs for the party, earliest first and smallest "
+                         "fitting table first.")
+async def find_next_available_slots(restaurant_id: int, search_request: schemas.FindNextAvailableSlots,
+                                    db: AsyncSession = Depends(get_async_primary_read_db)):
+    restaurant = await run_in_session(db, get_restaurant_or_404, restaurant_id)
+    return await run_in_session(db, utils.find_next_available_slots, restaurant, search_request.party_size,
+                                search_request.start, search_request.days, search_request.limit)
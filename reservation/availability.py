@@ -0,0 +1,291 @@
+"""Per table-day availability bitmaps.
+
+A day is split into ``SLOTS_PER_DAY`` slots of ``settings.TIME_SLOT_MINUTES``
+starting at midnight. Bit ``i`` of a table-day bitmap is set when slot ``i`` is
+reserved, so availability checks are plain integer mask operations.
+
+The bitmaps are stored in ``table_day_occupancy``, one row per table-day, and
+kept in step with the reservations by the writes of ``reservation.crud``.
+Reading a table-day is a primary key lookup however busy the table is.
+Changing ``TIME_SLOT_MINUTES`` requires ``python -m reservation.rebuild_occupancy``.
+"""
+import threading
+import time as timer
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from reservation.models import Reservation, TableDayOccupancy
+
+SLOT_MINUTES = settings.TIME_SLOT_MINUTES
+SLOT_SECONDS = SLOT_MINUTES * 60
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOT_BYTES = -(-SLOTS_PER_DAY // 8)
+UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _seconds_into_day(moment: datetime) -> int:
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def slot_of(moment: datetime) -> int:
+    return _seconds_into_day(moment) // SLOT_SECONDS
+
+
+def is_slot_aligned(moment: datetime) -> bool:
+    return not _seconds_into_day(moment) % SLOT_SECONDS and not moment.microsecond
+
+
+def range_mask(first: int, last: int) -> int:
+    """Bits of slots ``first`` (inclusive) to ``last`` (exclusive)."""
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def span_mask(start: datetime, end: datetime) -> int:
+    """Bits of every slot of ``start``'s day overlapped by ``[start, end)``."""
+    if end.date() > start.date():
+        last = SLOTS_PER_DAY
+    else:
+        last = -(-_seconds_into_day(end) // SLOT_SECONDS)
+    return range_mask(slot_of(start), last)
+
+
+def opening_mask(open_hour: int, close_hour: int) -> int:
+    slots_per_hour = 60 // SLOT_MINUTES
+    return range_mask(open_hour * slots_per_hour, close_hour * slots_per_hour)
+
+
+def is_bookable(available: int, start: datetime, end: datetime) -> bool:
+    """Whether ``[start, end)`` lies on the slot grid and every slot it covers is available."""
+    requested = span_mask(start, end)
+    return bool(requested) and is_slot_aligned(start) and not requested & ~available
+
+
+def iter_slots(bitmap: int) -> Iterator[int]:
+    """Indexes of the set bits of ``bitmap`` in ascending order."""
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+def slot_start(day: date, index: int) -> datetime:
+    return datetime.combine(day, time.min) + timedelta(seconds=index * SLOT_SECONDS)
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Half-open ``[start, end)`` timestamp range covering ``day``."""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def pack(bitmap: int) -> bytes:
+    return bitmap.to_bytes(SLOT_BYTES, "little")
+
+
+def unpack(slots: bytes) -> int:
+    return int.from_bytes(slots, "little")
+
+
+def load_tables_day(table_ids: Iterable[int], day: date, db: Session) -> Dict[int, int]:
+    bitmaps = {table_id: 0 for table_id in table_ids}
+    if not bitmaps:
+        return bitmaps
+    rows = db.query(TableDayOccupancy.table_id, TableDayOccupancy.slots).filter(
+        TableDayOccupancy.table_id.in_(list(bitmaps)),
+        TableDayOccupancy.day == day,
+    )
+    for table_id, slots in rows:
+        bitmaps[table_id] = unpack(slots)
+    return bitmaps
+
+
+def load_table_day(table_id: int, day: date, db: Session) -> int:
+    return load_tables_day([table_id], day, db)[table_id]
+
+
+def load_table_days(table_days: Set[Tuple[int, date]], db: Session) -> Dict[Tuple[int, date], int]:
+    """Bitmaps of arbitrary (table_id, day) pairs with one query over their tables and day range."""
+    bitmaps = {table_day: 0 for table_day in table_days}
+    if not bitmaps:
+        return bitmaps
+    days = [day for _, day in bitmaps]
+    rows = db.query(TableDayOccupancy.table_id, TableDayOccupancy.day, TableDayOccupancy.slots).filter(
+        TableDayOccupancy.table_id.in_({table_id for table_id, _ in bitmaps}),
+        TableDayOccupancy.day >= min(days),
+        TableDayOccupancy.day <= max(days),
+    )
+    for table_id, day, slots in rows:
+        if (table_id, day) in bitmaps:
+            bitmaps[(table_id, day)] = unpack(slots)
+    return bitmaps
+
+
+def scan_table_days(table_days: Set[Tuple[int, date]], db: Session) -> Dict[Tuple[int, date], int]:
+    """Like ``load_table_days`` but computed from the reservations, for maintenance and rebuilds."""
+    bitmaps = {table_day: 0 for table_day in table_days}
+    if not bitmaps:
+        return bitmaps
+    days = [day for _, day in bitmaps]
+    reservations = db.query(Reservation.table_id, Reservation.start_time, Reservation.end_time).filter(
+        Reservation.table_id.in_({table_id for table_id, _ in bitmaps}),
+        Reservation.start_time >= day_bounds(min(days))[0],
+        Reservation.start_time < day_bounds(max(days))[1],
+    )
+    for table_id, start_time, end_time in reservations:
+        key = (table_id, start_time.date())
+        if key in bitmaps:
+            bitmaps[key] |= span_mask(start_time, end_time)
+    return bitmaps
+
+
+def lock_table_day(table_id: int, day: date, db: Session):
+    """Serializes writes of a table-day until the current transaction ends.
+
+    Other databases rely on the unique (table_id, start_time) index alone.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(table_id, day.toordinal())))
+
+
+def lock_table_days(table_days: Iterable[Tuple[int, date]], db: Session):
+    # Always in the same order, so writers of overlapping table-days can't deadlock
+    for table_id, day in sorted(table_days):
+        lock_table_day(table_id, day, db)
+
+
+def save_occupancy(bitmaps: Dict[Tuple[int, date], int], db: Session):
+    """Upserts the occupancy rows of ``bitmaps`` in the current transaction, the caller holds their locks."""
+    if not bitmaps:
+        return
+    rows = [{"table_id": table_id, "day": day, "slots": pack(bitmap)} for (table_id, day), bitmap in bitmaps.items()]
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERTS:
+        for row in rows:
+            db.merge(TableDayOccupancy(**row))
+        return
+    statement = UPSERTS[dialect](TableDayOccupancy)
+    db.execute(statement.on_conflict_do_update(index_elements=["table_id", "day"],
+                                               set_={"slots": statement.excluded.slots}), rows)
+
+
+def add_occupancy(masks: Dict[Tuple[int, date], int], db: Session):
+    """Marks the ``masks`` slots of each table-day reserved, in the current transaction.
+
+    The caller takes the locks of the table-days before it inserts their
+    reservations, in the order of ``lock_table_days`` like every other writer.
+    """
+    occupancy = load_table_days(set(masks), db)
+    save_occupancy({key: occupancy[key] | mask for key, mask in masks.items()}, db)
+
+
+def refresh_occupancy(table_days: Set[Tuple[int, date]], db: Session):
+    """Recomputes the occupancy rows of ``table_days`` from the reservations, in the current transaction."""
+    lock_table_days(table_days, db)
+    bitmaps = scan_table_days(table_days, db)
+    save_occupancy({key: bitmap for key, bitmap in bitmaps.items() if bitmap}, db)
+    for table_id, day in [key for key, bitmap in bitmaps.items() if not bitmap]:
+        db.query(TableDayOccupancy).filter_by(table_id=table_id, day=day).delete(synchronize_session=False)
+
+
+class AvailabilityIndex:
+    """Bounded in-process cache of table-day occupancy bitmaps.
+
+    Entries are loaded from the database on first use and kept up to date by the
+    reservation write paths of this worker. Writes made by other workers are
+    picked up once an entry is older than ``ttl`` seconds; bookings are checked
+    against the database by ``reservation.crud.book_reservation``.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._bitmaps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, table_id: int, day: date, db: Session, refresh: bool = False) -> int:
+        key = (table_id, day)
+        if not refresh:
+            with self._lock:
+                entry = self._bitmaps.get(key)
+                if entry and timer.monotonic() - entry[1] < self.ttl:
+                    self._bitmaps.move_to_end(key)
+                    return entry[0]
+        bitmap = load_table_day(table_id, day, db)
+        self.put(table_id, day, bitmap)
+        return bitmap
+
+    def get_many(self, table_ids: Iterable[int], day: date, db: Session) -> Dict[int, int]:
+        """Bitmaps of several tables for ``day``, loading all missing entries with one query."""
+        bitmaps, missing = {}, []
+        now = timer.monotonic()
+        with self._lock:
+            for table_id in table_ids:
+                entry = self._bitmaps.get((table_id, day))
+                if entry and now - entry[1] < self.ttl:
+                    bitmaps[table_id] = entry[0]
+                else:
+                    missing.append(table_id)
+        for table_id, bitmap in load_tables_day(missing, day, db).items():
+            self.put(table_id, day, bitmap)
+            bitmaps[table_id] = bitmap
+        return bitmaps
+
+    def get_days(self, table_ids: Iterable[int], days: Iterable[date], db: Session) -> Dict[Tuple[int, date], int]:
+        """Bitmaps of every table on every day, loading all missing entries with one query."""
+        bitmaps, missing = {}, set()
+        now = timer.monotonic()
+        with self._lock:
+            for day in days:
+                for table_id in table_ids:
+                    entry = self._bitmaps.get((table_id, day))
+                    if entry and now - entry[1] < self.ttl:
+                        bitmaps[(table_id, day)] = entry[0]
+                    else:
+                        missing.add((table_id, day))
+        for (table_id, day), bitmap in load_table_days(missing, db).items():
+            self.put(table_id, day, bitmap)
+            bitmaps[(table_id, day)] = bitmap
+        return bitmaps
+
+    def put(self, table_id: int, day: date, bitmap: int):
+        key = (table_id, day)
+        with self._lock:
+            self._bitmaps[key] = (bitmap, timer.monotonic())
+            self._bitmaps.move_to_end(key)
+            while len(self._bitmaps) > self.max_entries:
+                self._bitmaps.popitem(last=False)
+
+    def reserve(self, table_id: int, start: datetime, end: datetime):
+        self._update(table_id, start, end, reserve=True)
+
+    def release(self, table_id: int, start: datetime, end: datetime):
+        self._update(table_id, start, end, reserve=False)
+
+    def invalidate(self, table_id: int = None):
+        with self._lock:
+            if table_id is None:
+                self._bitmaps.clear()
+                return
+            for key in [key for key in self._bitmaps if key[0] == table_id]:
+                del self._bitmaps[key]
+
+    def _update(self, table_id: int, start: datetime, end: datetime, reserve: bool):
+        # Entries not in the index are loaded from the database on next use
+        key = (table_id, start.date())
+        mask = span_mask(start, end)
+        with self._lock:
+            entry = self._bitmaps.get(key)
+            if entry:
+                bitmap = entry[0] | mask if reserve else entry[0] & ~mask
+                self._bitmaps[key] = (bitmap, entry[1])
+
+
+availability_index = AvailabilityIndex(settings.AVAILABILITY_INDEX_SIZE, settings.AVAILABILITY_INDEX_TTL)
@@ -0,0 +1,116 @@
+"""Versioned cache of availability responses, in Redis with an in-process L1.
+
+Every cached value is stored under its key plus the current tokens of the
+version keys it depends on. Writes delete the version keys, so the next read
+creates new tokens and can't reach the values computed before the write, no
+matter which worker or L1 holds them. Tokens are random, so a version is never
+reused after it is deleted or evicted.
+"""
+import logging
+import uuid
+from datetime import date
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.core.redis import cache_key, get_json, set_json
+
+logger = logging.getLogger(__name__)
+
+CACHE_HEADER = "X-MyAPI-Cache"
+
+
+def table_day_version(table_id: int, day: date) -> str:
+    return f"availability:version:table:{table_id}:{day.isoformat()}"
+
+
+def restaurant_version(restaurant_id: int) -> str:
+    return f"availability:version:restaurant:{restaurant_id}"
+
+
+def restaurant_metadata_version(restaurant_id: int) -> str:
+    """Changes with the opening hours and tables of the restaurant, unlike ``restaurant_version`` not with bookings."""
+    return f"availability:version:restaurant-metadata:{restaurant_id}"
+
+
+class AvailabilityCache:
+
+    def __init__(self, ttl: int, local_size: int):
+        self.ttl = ttl
+        self.local = TTLCache(local_size, ttl, name="availability_local")
+
+    async def versions(self, redis: Redis, version_keys: Sequence[str]) -> Optional[List[str]]:
+        """Current tokens of ``version_keys``, creating missing ones, in one round trip."""
+        pipeline = redis.pipeline(transaction=False)
+        for key in version_keys:
+            pipeline.set(cache_key(key), uuid.uuid4().hex, nx=True, ex=self.ttl)
+        pipeline.mget([cache_key(key) for key in version_keys])
+        try:
+            tokens = (await pipeline.execute())[-1]
+        except (RedisError, OSError) as error:
+            logger.warning("Redis read failed: %s", error)
+            return None
+        if None in tokens:
+            return None
+        return [token.decode() for token in tokens]
+
+    async def get_or_compute(self, redis: Redis, key: str, version_keys: Sequence[str],
+                             compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """The value of ``key``, computing and storing it on a miss, and whether it was a hit.
+
+        ``compute`` must return JSON-serializable data. Without Redis nothing is
+        cached, as the L1 can't tell whether its entries are current.
+        """
+        tokens = await self.versions(redis, version_keys)
+        if tokens is None:
+            record_cache("availability", False)
+            return await compute(), False
+        versioned_key = ":".join([key, *tokens])
+        value = self.local.get(versioned_key)
+        if value is None:
+            value = await get_json(redis, versioned_key)
+        if value is not None:
+            self.local.set(versioned_key, value)
+            record_cache("availability", True)
+            return value, True
+        record_cache("availability", False)
+        value = await compute()
+        await set_json(redis, versioned_key, value, self.ttl)
+        self.local.set(versioned_key, value)
+        return value, False
+
+    async def invalidate(self, redis: Redis, *version_keys: str):
+        if not version_keys:
+            return
+        try:
+            await redis.delete(*[cache_key(key) for key in version_keys])
+        except (RedisError, OSError) as error:
+            # Values expire after ``ttl`` seconds at the latest
+            logger.warning("Availability cache invalidation failed: %s", error)
+
+
+availability_cache = AvailabilityCache(settings.AVAILABILITY_CACHE_TTL, settings.AVAILABILITY_CACHE_SIZE)
+
+
+async def invalidate_table_day(redis: Redis, restaurant_id: int, table_id: int, day: date):
+    """Called after a reservation of the table-day is created or deleted."""
+    await availability_cache.invalidate(redis, table_day_version(table_id, day), restaurant_version(restaurant_id))
+
+
+async def invalidate_table_days(redis: Redis, table_days: Iterable[Tuple[int, int, date]]):
+    """Bulk version of ``invalidate_table_day`` for (restaurant_id, table_id, day) triples."""
+    keys = set()
+    for restaurant_id, table_id, day in table_days:
+        keys.update((table_day_version(table_id, day), restaurant_version(restaurant_id)))
+    await availability_cache.invalidate(redis, *keys)
+
+
+async def invalidate_restaurant(redis: Redis, *restaurant_ids: int):
+    """Called after the restaurant or its set of tables changes."""
+    await availability_cache.invalidate(redis, *[key for restaurant_id in restaurant_ids
+                                                 for key in (restaurant_version(restaurant_id),
+                                                             restaurant_metadata_version(restaurant_id))])
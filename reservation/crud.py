@@ -1,48 +1,98 @@
-from datetime import datetime
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional, Set, Tuple
 
-from requests import Session
-from sqlalchemy import cast, Date, desc, asc
+from sqlalchemy import desc, asc, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
+from app.bulk import RowError, chunked
+from app.pagination import estimate_count, paginate_by_keyset
+from reservation.availability import add_occupancy, availability_index, day_bounds, is_bookable, load_table_day, \
+    load_table_days, lock_table_day, lock_table_days, opening_mask, refresh_occupancy, save_occupancy, span_mask
 from reservation.models import Reservation
 from reservation.schemas import CreateReservationSchema, ReservationDetailsSchema
-from restaurant_management.models import Table
+from restaurant_management.models import Restaurant, Table
 
 
 def create_reservation(reservation_request: CreateReservationSchema, db: Session) -> ReservationDetailsSchema:
     data = reservation_request.dict()
     data['start_time'] = data['start_time'].replace(tzinfo=None)
     data['end_time'] = data['end_time'].replace(tzinfo=None)
+    lock_table_day(data['table_id'], data['start_time'].date(), db)
     db_item = Reservation(**data)
     db.add(db_item)
+    db.flush()
+    add_occupancy({(db_item.table_id, db_item.start_time.date()): span_mask(db_item.start_time, db_item.end_time)},
+                  db)
     db.commit()
     db.refresh(db_item)
+    availability_index.reserve(db_item.table_id, db_item.start_time, db_item.end_time)
     return db_item
 
 
-def get_tables_with_better_allocation(selected_table: Table, start_time: datetime,
-                                      end_time: datetime,
-                                      number_of_customers,
-                                      db: Session):
-    reservations = db.query(Reservation.table_id).filter(Reservation.start_time >= start_time,
-                                                   Reservation.end_time <= end_time)
-    return db.query(Table).filter(Table.id != selected_table.id, Table.restaurant_id == selected_table.restaurant_id,
-                                  Table.number_of_seats >= number_of_customers,
-                                  Table.number_of_seats < selected_table.number_of_seats) \
-        .join(Reservation, isouter=True).filter(Reservation.id == None, Table.id.not_in(reservations)).order_by(
-        asc(Table.number_of_seats)).all()
+def book_reservation(reservation_request: CreateReservationSchema, restaurant: Restaurant, db: Session) \
+        -> Optional[ReservationDetailsSchema]:
+    """Checks the slot and inserts the reservation and its occupancy in one transaction.
 
+    Returns ``None`` when the slot is not bookable, including when a concurrent
+    booking wins the race.
+    """
+    data = reservation_request.dict()
+    data['start_time'] = data['start_time'].replace(tzinfo=None)
+    data['end_time'] = data['end_time'].replace(tzinfo=None)
+    table_id, day = data['table_id'], data['start_time'].date()
 
-def get_reservations_by_restaurant_id(restaurant_id: int, db: Session, start_time: datetime = None,
-                                      end_time: datetime = None, table_id: int = None, order: str = None) \
-        -> List[ReservationDetailsSchema]:
-    query = db.query(Reservation).join(Table).filter_by(restaurant_id=restaurant_id)
+    lock_table_day(table_id, day, db)
+    occupied = load_table_day(table_id, day, db)
+    available = opening_mask(restaurant.open_hour, restaurant.close_hour) & ~occupied
+    if not is_bookable(available, data['start_time'], data['end_time']):
+        db.rollback()
+        availability_index.put(table_id, day, occupied)
+        return None
+
+    db_item = Reservation(**data)
+    db.add(db_item)
+    occupied |= span_mask(data['start_time'], data['end_time'])
+    try:
+        db.flush()
+        reservation = ReservationDetailsSchema.from_orm(db_item)
+        # The table-day is locked, so the occupancy read above is current
+        save_occupancy({(table_id, day): occupied}, db)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        availability_index.invalidate(table_id)
+        return None
+    availability_index.put(table_id, day, occupied)
+    return reservation
+
+
+def reservations_by_restaurant_filters(restaurant_id: int, start_time: datetime = None, end_time: datetime = None,
+                                       table_id: int = None) -> list:
+    """Filter clauses for the reservations of a restaurant, which need ``Table`` joined.
+
+    The ``start_time`` bounds also let Postgres skip the monthly partitions outside of them.
+    """
+    filters = [Table.restaurant_id == restaurant_id]
     if start_time:
-        query = query.filter(cast(Reservation.start_time, Date) >= start_time.date())
+        filters.append(Reservation.start_time >= day_bounds(start_time.date())[0])
     if end_time:
-        query = query.filter(cast(Reservation.start_time, Date) < end_time.date())
+        filters.append(Reservation.start_time < day_bounds(end_time.date())[0])
     if table_id:
-        query = query.filter(Reservation.table_id == table_id)
+        filters.append(Reservation.table_id == table_id)
+    return filters
+
+
+def reservations_by_restaurant_query(restaurant_id: int, db: Session, start_time: datetime = None,
+                                     end_time: datetime = None, table_id: int = None):
+    return db.query(Reservation).join(Table).filter(
+        *reservations_by_restaurant_filters(restaurant_id, start_time, end_time, table_id))
+
+
+def get_reservations_by_restaurant_id(restaurant_id: int, db: Session, start_time: datetime = None,
+                                      end_time: datetime = None, table_id: int = None, order: str = None) \
+        -> List[ReservationDetailsSchema]:
+    query = reservations_by_restaurant_query(restaurant_id, db, start_time, end_time, table_id)
     if order == 'desc':
         query = query.order_by(
             desc(Reservation.start_time)
@@ -55,5 +105,93 @@ def get_reservations_by_restaurant_id(restaurant_id: int, db: Session, start_tim
     return query.all()
 
 
+def get_reservations_page(restaurant_id: int, db: Session, start_time: datetime = None, end_time: datetime = None,
+                          table_id: int = None, order: str = None, cursor: str = None, size: int = 50,
+                          estimate: bool = False) -> dict:
+    query = reservations_by_restaurant_query(restaurant_id, db, start_time, end_time, table_id)
+    items, next_cursor = paginate_by_keyset(query, [Reservation.start_time, Reservation.id], size, cursor,
+                                            descending=order == 'desc')
+    return {
+        'items': items,
+        'size': size,
+        'next_cursor': next_cursor,
+        'estimated_total': estimate_count(query, db) if estimate else None,
+    }
+
+
 def delete_reservation_by_id(reservation_id: int, db: Session):
-    return db.query(Reservation).filter_by(id=reservation_id).delete()
+    reservation = db.query(Reservation).get(reservation_id)
+    if not reservation:
+        return 0
+    lock_table_day(reservation.table_id, reservation.start_time.date(), db)
+    db.delete(reservation)
+    db.flush()
+    # Recomputed rather than cleared, reservations off the slot grid can share a slot
+    refresh_occupancy({(reservation.table_id, reservation.start_time.date())}, db)
+    db.commit()
+    availability_index.release(reservation.table_id, reservation.start_time, reservation.end_time)
+    return 1
+
+
+def bulk_create_reservations(reservations: List[Tuple[int, CreateReservationSchema]], db: Session,
+                             chunk_size: int) -> Tuple[int, List[RowError], Set[Tuple[int, int, date]]]:
+    """Inserts numbered, validated rows with executemany, one transaction per chunk of ``chunk_size``.
+
+    Each chunk loads its tables and the occupancy of every table-day it touches
+    with one query each, then checks seats, opening hours and overlaps with
+    existing and earlier uploaded reservations in memory. Returns the number of
+    inserted rows, the rejected rows and the (restaurant_id, table_id, day)
+    triples that got reservations.
+    """
+    inserted, errors, table_days, occupancy = 0, [], set(), {}
+    for chunk in chunked(reservations, chunk_size):
+        rows = []
+        for row, reservation in chunk:
+            data = reservation.dict()
+            data['start_time'] = data['start_time'].replace(tzinfo=None)
+            data['end_time'] = data['end_time'].replace(tzinfo=None)
+            rows.append((row, data))
+        tables = {table.id: (table, restaurant) for table, restaurant in db.query(Table, Restaurant).join(
+            Restaurant, Table.restaurant_id == Restaurant.id
+        ).filter(Table.id.in_({data['table_id'] for _, data in rows}))}
+        occupancy.update(load_table_days({(data['table_id'], data['start_time'].date()) for _, data in rows
+                                          if data['table_id'] in tables} - occupancy.keys(), db))
+
+        accepted, chunk_occupancy = [], {}
+        for row, data in rows:
+            if data['table_id'] not in tables:
+                errors.append(RowError(row=row, detail=f"Table {data['table_id']} does not exist."))
+                continue
+            table, restaurant = tables[data['table_id']]
+            key = (table.id, data['start_time'].date())
+            occupied = chunk_occupancy.get(key, occupancy[key])
+            if table.number_of_seats < data['number_of_customers']:
+                errors.append(RowError(row=row, detail="Table seats are not enough."))
+            elif not is_bookable(opening_mask(restaurant.open_hour, restaurant.close_hour) & ~occupied,
+                                 data['start_time'], data['end_time']):
+                errors.append(RowError(row=row, detail="Time slot is not available."))
+            else:
+                chunk_occupancy[key] = occupied | span_mask(data['start_time'], data['end_time'])
+                accepted.append((row, data, restaurant.id))
+        if not accepted:
+            continue
+        try:
+            lock_table_days(chunk_occupancy, db)
+            db.execute(insert(Reservation), [data for _, data, _ in accepted])
+            add_occupancy({key: chunk_occupancy[key] & ~occupancy[key] for key in chunk_occupancy}, db)
+            db.commit()
+        except IntegrityError:
+            # A concurrent booking took one of the slots, the occupancy is reloaded for the next chunks
+            db.rollback()
+            errors.extend(RowError(row=row, detail="Conflicts with a concurrent write, retry the row.")
+                          for row, _, _ in accepted)
+            for key in chunk_occupancy:
+                occupancy.pop(key, None)
+            continue
+        occupancy.update(chunk_occupancy)
+        inserted += len(accepted)
+        table_days.update((restaurant_id, data['table_id'], data['start_time'].date())
+                          for _, data, restaurant_id in accepted)
+    for table_id in {table_id for _, table_id, _ in table_days}:
+        availability_index.invalidate(table_id)
+    return inserted, errors, table_days
@@ -0,0 +1,72 @@
+"""Streaming export of reservations as NDJSON or CSV.
+
+Rows are read from a server-side cursor in batches of ``EXPORT_BATCH_SIZE`` and
+encoded batch by batch, so memory use doesn't depend on the size of the export.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from reservation.crud import reservations_by_restaurant_filters
+from reservation.models import Reservation
+from restaurant_management.models import Table
+
+EXPORT_COLUMNS = (Reservation.id, Reservation.table_id, Reservation.main_guest_name,
+                  Reservation.number_of_customers, Reservation.start_time, Reservation.end_time)
+FIELDS = [column.key for column in EXPORT_COLUMNS]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_statement(restaurant_id: int, start_time: datetime = None, end_time: datetime = None,
+                     table_id: int = None):
+    return select(*EXPORT_COLUMNS).join(Table, Reservation.table_id == Table.id).where(
+        *reservations_by_restaurant_filters(restaurant_id, start_time, end_time, table_id)
+    ).order_by(Reservation.start_time, Reservation.id)
+
+
+async def stream_batches(db: AsyncSession, statement, batch_size: int) -> AsyncIterator[List[tuple]]:
+    result = await db.stream(statement.execution_options(yield_per=batch_size))
+    async for batch in result.partitions():
+        yield batch
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_ndjson(batch: List[tuple]) -> str:
+    return "".join(json.dumps(dict(zip(FIELDS, map(_value, row)))) + "\n" for row in batch)
+
+
+def encode_csv(batch: List[tuple], header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(FIELDS)
+    writer.writerows([_value(value) for value in row] for row in batch)
+    return buffer.getvalue()
+
+
+async def export_reservations(db: AsyncSession, statement, export_format: str, batch_size: int,
+                              compress: bool = False) -> AsyncIterator[bytes]:
+    """Encoded export of ``statement``'s rows, gzip compressed on the fly when ``compress`` is set."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+
+    def encode(text: str) -> bytes:
+        return compressor.compress(text.encode()) if compressor else text.encode()
+
+    if export_format == "csv":
+        # The header goes out even when there are no rows
+        yield encode(encode_csv([], header=True))
+    async for batch in stream_batches(db, statement, batch_size):
+        chunk = encode(encode_csv(batch) if export_format == "csv" else encode_ndjson(batch))
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, Column, String, ForeignKey, DateTime
+from sqlalchemy import Integer, Column, String, ForeignKey, DateTime, Index, Date, LargeBinary
 
 from app.database import Base
 
@@ -13,6 +13,24 @@ class Reservation(Base):
     start_time = Column(DateTime())
     end_time = Column(DateTime())
 
+    __table_args__ = (
+        # Bookings are single grid-aligned slots, so this also prevents double bookings
+        Index("ix_reservations_table_id_start_time", "table_id", "start_time", unique=True),
+        Index("ix_reservations_start_time", "start_time"),
+    )
+
     @property
     def duration(self):
         return self.end_time - self.end_time
+
+
+class TableDayOccupancy(Base):
+    """Reserved slots of a table-day, the bitmap of ``reservation.availability`` packed little-endian.
+
+    Written in the transaction of every reservation write, see ``reservation.crud``.
+    """
+    __tablename__ = "table_day_occupancy"
+
+    table_id = Column(Integer, ForeignKey("tables.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    slots = Column(LargeBinary, nullable=False)
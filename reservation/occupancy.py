@@ -0,0 +1,46 @@
+"""Restaurant-wide occupancy matrices.
+
+``build_occupancy_matrix`` returns a boolean ``days x tables x slots`` array in
+which ``[d, t, s]`` is set when table ``t`` is reserved during slot ``s`` of day
+``d``. The matrix is filled from the ``table_day_occupancy`` rows of the range
+with a single query.
+"""
+from datetime import date, timedelta
+from typing import List
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from reservation.availability import SLOT_BYTES, SLOT_SECONDS, SLOTS_PER_DAY
+from reservation.models import TableDayOccupancy
+
+
+def build_occupancy_matrix(table_ids: List[int], first_day: date, days: int, db: Session) -> np.ndarray:
+    occupancy = np.zeros((days, len(table_ids), SLOTS_PER_DAY), dtype=bool)
+    if not table_ids:
+        return occupancy
+
+    rows = db.query(TableDayOccupancy.table_id, TableDayOccupancy.day, TableDayOccupancy.slots).filter(
+        TableDayOccupancy.table_id.in_(table_ids),
+        TableDayOccupancy.day >= first_day,
+        TableDayOccupancy.day < first_day + timedelta(days=days),
+    ).all()
+    if rows:
+        positions = {table_id: index for index, table_id in enumerate(table_ids)}
+        day_rows = np.fromiter(((row[1] - first_day).days for row in rows), dtype=np.intp, count=len(rows))
+        table_rows = np.fromiter((positions[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+        packed = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.uint8).reshape(len(rows), SLOT_BYTES)
+        occupancy[day_rows, table_rows] = np.unpackbits(packed, axis=1, bitorder="little")[:, :SLOTS_PER_DAY]
+    return occupancy
+
+
+def opening_vector(open_hour: int, close_hour: int) -> np.ndarray:
+    slots_per_hour = 3600 // SLOT_SECONDS
+    opening = np.zeros(SLOTS_PER_DAY, dtype=bool)
+    opening[open_hour * slots_per_hour:close_hour * slots_per_hour] = True
+    return opening
+
+
+def free_slots_matrix(occupancy: np.ndarray, open_hour: int, close_hour: int) -> np.ndarray:
+    """Slots in which each table is open and not reserved, same shape as ``occupancy``."""
+    return ~occupancy & opening_vector(open_hour, close_hour)
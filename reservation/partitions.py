@@ -0,0 +1,106 @@
+"""Monthly partitions of ``reservations`` on Postgres.
+
+The migration partitions the table by month on ``start_time`` and installs the
+``create_reservation_partition`` function. This job keeps partitions created
+``RESERVATION_PARTITIONS_AHEAD`` months ahead, moving rows out of the default
+partition, and archives partitions older than ``RESERVATION_RETENTION_MONTHS``
+by detaching them into the ``RESERVATION_ARCHIVE_SCHEMA`` schema::
+
+    python -m reservation.partitions maintain      # both, run daily from cron
+    python -m reservation.partitions create --ahead 6
+    python -m reservation.partitions archive --retention-months 12
+
+Queries only scan the partitions of their ``start_time`` range, see
+``reservation.crud.reservations_by_restaurant_filters``. Other databases have
+no partitions and the job does nothing.
+"""
+import argparse
+import re
+from datetime import date
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal
+
+PARTITION_NAME = re.compile(r"^reservations_y(\d{4})m(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('reservations')")).scalar() == "p"
+
+
+def list_partitions(db: Session) -> Dict[str, date]:
+    """Monthly partitions attached to ``reservations`` by name, with their first day."""
+    names = db.execute(text("SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = inhrelid "
+                            "WHERE inhparent = 'reservations'::regclass")).scalars()
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def create_partitions(db: Session, ahead: int, today: date = None) -> List[str]:
+    """Creates the partitions of this month and the ``ahead`` next ones, returns those created."""
+    if not is_partitioned(db):
+        return []
+    this_month = (today or date.today()).replace(day=1)
+    created = []
+    for months in range(ahead + 1):
+        month = add_months(this_month, months)
+        if db.execute(text("SELECT create_reservation_partition(:month)"), {"month": month}).scalar():
+            created.append(f"reservations_y{month.year}m{month.month:02}")
+        # One transaction per partition keeps the default partition locked only briefly
+        db.commit()
+    return created
+
+
+def archive_partitions(db: Session, retention_months: int, schema: str, today: date = None) -> List[str]:
+    """Detaches the partitions that ended more than ``retention_months`` ago into ``schema``."""
+    if not is_partitioned(db):
+        return []
+    cutoff = add_months((today or date.today()).replace(day=1), -retention_months)
+    db.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+    archived = []
+    for name, month in sorted(list_partitions(db).items(), key=lambda partition: partition[1]):
+        if add_months(month, 1) > cutoff:
+            continue
+        db.execute(text(f'ALTER TABLE reservations DETACH PARTITION "{name}"'))
+        db.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{schema}"'))
+        db.commit()
+        archived.append(name)
+    db.commit()
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["create", "archive", "maintain"])
+    parser.add_argument("--ahead", type=int, default=settings.RESERVATION_PARTITIONS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=settings.RESERVATION_RETENTION_MONTHS)
+    parser.add_argument("--schema", default=settings.RESERVATION_ARCHIVE_SCHEMA)
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        if args.command in ("create", "maintain"):
+            print(f"Created partitions: {', '.join(create_partitions(db, args.ahead)) or 'none'}")
+        if args.command in ("archive", "maintain"):
+            archived = archive_partitions(db, args.retention_months, args.schema)
+            print(f"Archived partitions to {args.schema}: {', '.join(archived) or 'none'}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Rebuilds ``table_day_occupancy`` from the reservations.
+
+The migration of the table backfills it with this. Run it to repair the table
+after changes to ``TIME_SLOT_MINUTES``::
+
+    python -m reservation.rebuild_occupancy
+    python -m reservation.rebuild_occupancy --since 2030-01-01 --batch-size 500
+
+Table-days are refreshed in batches, each in its own transaction and under the
+table-day locks taken by bookings, so it is safe to run while serving traffic.
+"""
+import argparse
+from datetime import date
+from typing import Iterator, List, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from reservation.availability import refresh_occupancy
+from reservation.models import Reservation, TableDayOccupancy
+from restaurant_management.models import Table
+
+
+def table_days(table_id: int, since: date, db: Session) -> Set[Tuple[int, date]]:
+    """Days of the table with reservations or with a stored row, which may be stale."""
+    keys = {(table_id, day) for day, in db.query(TableDayOccupancy.day).filter(
+        TableDayOccupancy.table_id == table_id, TableDayOccupancy.day >= since)}
+    starts = db.query(Reservation.start_time).filter(
+        Reservation.table_id == table_id, Reservation.start_time >= since
+    ).execution_options(yield_per=10000)
+    keys.update((table_id, start_time.date()) for start_time, in starts)
+    return keys
+
+
+def batches(keys: Set[Tuple[int, date]], size: int) -> Iterator[List[Tuple[int, date]]]:
+    ordered = sorted(keys)
+    for index in range(0, len(ordered), size):
+        yield ordered[index:index + size]
+
+
+def rebuild_occupancy(db: Session, since: date = date.min, batch_size: int = 500) -> int:
+    """Recomputes every table-day from ``since`` on, returns the number of table-days refreshed."""
+    refreshed = 0
+    for table_id, in db.query(Table.id).order_by(Table.id).all():
+        for batch in batches(table_days(table_id, since, db), batch_size):
+            refresh_occupancy(set(batch), db)
+            db.commit()
+            refreshed += len(batch)
+    return refreshed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=date.fromisoformat, default=date.min,
+                        help="only rebuild days from this ISO date on")
+    parser.add_argument("--batch-size", type=int, default=500, help="table-days per transaction")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        print(f"Refreshed {rebuild_occupancy(db, args.since, args.batch_size)} table-days")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime, timezone
+from typing import List, Optional
 
-import pytz
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, validator
 
 from app.core.config import settings
 
@@ -14,29 +14,39 @@ class ReservationBaseSchema(BaseModel):
     start_time: datetime
 
 
-class CreateReservationSchema(ReservationBaseSchema):
+def time_slot_validation(cls, start_time, values, **kwargs):
+
+    end_time = values.get('end_time', None)
+    now_date = datetime.now(tz=timezone.utc)
+    if start_time >= end_time:
+        raise ValueError('start time should be before end time')
+    if start_time < now_date or now_date > end_time:
+        raise ValueError('Selected dates should be only in future')
 
-    @validator('start_time', pre=False)
-    def time_slot_validation(cls, start_time, values, **kwargs):
+    if (end_time - start_time).seconds // 60 != settings.TIME_SLOT_MINUTES:
+        raise ValueError(F'Duration between start and end time not equal to {settings.TIME_SLOT_MINUTES}')
+    if not end_time or not start_time:
+        raise ValueError('start and end time are mandatory fields')
 
-        end_time = values.get('end_time', None)
-        now_date = datetime.now(tz=pytz.UTC)
-        if start_time >= end_time:
-            raise ValueError('start time should be before end time')
-        if start_time < now_date or now_date > end_time:
-            raise ValueError('Selected dates should be only in future')
+    return start_time
 
-        if (end_time - start_time).seconds // 60 != settings.TIME_SLOT_MINUTES:
-            raise ValueError(F'Duration between start and end time not equal to {settings.TIME_SLOT_MINUTES}')
-        if not end_time or not start_time:
-            raise ValueError('start and end time are mandatory fields')
 
-        return start_time
+class CreateReservationSchema(ReservationBaseSchema):
+    _time_slot_validation = validator('start_time', pre=False, allow_reuse=True)(time_slot_validation)
 
     class Config:
         orm_mode = True
 
 
+class BookBestTableSchema(BaseModel):
+    main_guest_name: str
+    number_of_customers: int = Field(gt=0)
+    end_time: datetime
+    start_time: datetime
+
+    _time_slot_validation = validator('start_time', pre=False, allow_reuse=True)(time_slot_validation)
+
+
 class ReservationDetailsSchema(ReservationBaseSchema):
     id: int
 
@@ -54,3 +64,52 @@ class TimeSlotSchema(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class CalculateRestaurantAvailability(BaseModel):
+    start_date: date
+    end_date: Optional[date]
+    party_size: Optional[int] = Field(default=None, gt=0)
+
+    @validator('end_date', always=True)
+    def date_range_validation(cls, end_date, values, **kwargs):
+        start_date = values.get('start_date')
+        if not end_date or not start_date:
+            return start_date
+        if end_date < start_date:
+            raise ValueError('end date should not be before start date')
+        if (end_date - start_date).days >= settings.AVAILABILITY_MAX_DAYS:
+            raise ValueError(f'Date range should not exceed {settings.AVAILABILITY_MAX_DAYS} days')
+        return end_date
+
+
+class TableAvailabilitySchema(BaseModel):
+    table_id: int
+    number_of_seats: int
+    slots: List[TimeSlotSchema]
+
+
+class DayAvailabilitySchema(BaseModel):
+    date: date
+    tables: List[TableAvailabilitySchema]
+
+
+class FindNextAvailableSlots(BaseModel):
+    party_size: int = Field(gt=0)
+    start: Optional[datetime]
+    days: int = Field(default=14, gt=0, le=settings.AVAILABILITY_MAX_DAYS)
+    limit: int = Field(default=10, gt=0, le=100)
+
+    @validator('start', always=True)
+    def start_validation(cls, start, **kwargs):
+        # Slots in the past are never offered. Bookings keep the wall-clock time of aware datetimes and reject
+        # starts before the current instant, so aware starts are compared with the time in their own zone.
+        now = datetime.now(start.tzinfo if start else None).replace(tzinfo=None)
+        return max(start.replace(tzinfo=None), now) if start else now
+
+
+class NextAvailableSlotSchema(BaseModel):
+    table_id: int
+    number_of_seats: int
+    start: datetime
+    end: datetime
@@ -1,39 +1,80 @@
-from datetime import datetime, timedelta
-from typing import Union, Optional
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, Union, Optional
 
+import numpy as np
 from fastapi import Depends
-from sqlalchemy import Date, cast
 from sqlalchemy.orm import Session
 
 from app.dependencies import get_db
-from reservation.models import Reservation
-import restaurant_management.crud as restaurant_crud
+from reservation.availability import SLOT_MINUTES, SLOT_SECONDS, SLOTS_PER_DAY, availability_index, iter_slots, \
+    opening_mask, range_mask
+from reservation.occupancy import build_occupancy_matrix, free_slots_matrix
+from restaurant_management.registry import metadata_registry
+
+
+EPOCH = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes=1)
+SEARCH_WINDOW_DAYS = 7
+
+
+def to_epoch_minutes(moment: datetime) -> int:
+    """Whole minutes since the epoch, aware datetimes keep their wall-clock time like the stored reservations."""
+    moment = moment.replace(tzinfo=None)
+    return (moment - EPOCH) // MINUTE
+
+
+def from_epoch_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=minutes)
 
 
 class TimeSlot():
+    """A time slot stored as two integer minute offsets from the epoch.
+
+    Hashing and comparisons work on the integers; datetimes are only built when
+    ``start`` or ``end`` are read, which happens when a response is serialized.
+    Precision is one minute.
+    """
 
     # https://github.com/ErikBjare/timeslot/blob/master/src/timeslot/timeslot.py
     # Inspired by: http://www.codeproject.com/Articles/168662/Time-Period-Library-for-NET
+    __slots__ = ("start_minute", "end_minute")
+
     def __init__(self, start: datetime, end: datetime) -> None:
         # TODO: Introduce once tested in production (where negative duration events might occur)
         # if start > end:
         #     raise ValueError("Timeslot cannot have negative duration, start '{}' came after end '{}'".format(start,
         #     end))
-        self.start = start
-        self.end = end
+        self.start_minute = to_epoch_minutes(start)
+        self.end_minute = to_epoch_minutes(end)
+
+    @classmethod
+    def from_minutes(cls, start_minute: int, end_minute: int) -> "TimeSlot":
+        time_slot = cls.__new__(cls)
+        time_slot.start_minute = start_minute
+        time_slot.end_minute = end_minute
+        return time_slot
+
+    @property
+    def start(self) -> datetime:
+        return from_epoch_minutes(self.start_minute)
+
+    @property
+    def end(self) -> datetime:
+        return from_epoch_minutes(self.end_minute)
 
     def __repr__(self) -> str:
         return "<Timeslot(start={}, end={})>".format(self.start, self.end)
 
     @property
     def duration(self) -> timedelta:
-        return self.end - self.start
+        return (self.end_minute - self.start_minute) * MINUTE
 
     def overlaps(self, other: "TimeSlot") -> bool:
         """Checks if this time slot is overlapping partially or entirely with another timeslot"""
         return (
-                self.start <= other.start < self.end
-                or self.start < other.end <= self.end
+                self.start_minute <= other.start_minute < self.end_minute
+                or self.start_minute < other.end_minute <= self.end_minute
                 or self in other
         )
 
@@ -44,7 +85,7 @@ class TimeSlot():
     def contains(self, other: Union[datetime, "TimeSlot"]) -> bool:
         """Checks if this time slot contains the entirety of another timeslot or a datetime"""
         if isinstance(other, TimeSlot):
-            return self.start <= other.start and other.end <= self.end
+            return self.start_minute <= other.start_minute and other.end_minute <= self.end_minute
         elif isinstance(other, datetime):
             return self.start <= other <= self.end
         else:
@@ -55,14 +96,14 @@ class TimeSlot():
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, TimeSlot):
-            return self.start == other.start and self.end == other.end
+            return self.start_minute == other.start_minute and self.end_minute == other.end_minute
         else:
             return False
 
     def __lt__(self, other: object) -> bool:
         # implemented to easily allow sorting of a list of timeslots
         if isinstance(other, TimeSlot):
-            return self.start < other.start
+            return self.start_minute < other.start_minute
         else:
             raise TypeError(
                 "operator not supported between instaces of '{}' and '{}'".format(
@@ -76,12 +117,12 @@ class TimeSlot():
         if self.contains(other):
             # Entirety of other is within self
             return other
-        elif self.start <= other.start < self.end:
+        elif self.start_minute <= other.start_minute < self.end_minute:
             # End part of self intersects
-            return TimeSlot(other.start, self.end)
-        elif self.start < other.end <= self.end:
+            return TimeSlot.from_minutes(other.start_minute, self.end_minute)
+        elif self.start_minute < other.end_minute <= self.end_minute:
             # Start part of self intersects
-            return TimeSlot(self.start, other.end)
+            return TimeSlot.from_minutes(self.start_minute, other.end_minute)
         elif other.contains(self):
             # Entirety of self is within other
             return self
@@ -89,61 +130,133 @@ class TimeSlot():
 
     def adjacent(self, other: "TimeSlot") -> bool:
         """Iff timeslots are exactly next to each other, return True."""
-        return self.start == other.end or self.end == other.start
+        return self.start_minute == other.end_minute or self.end_minute == other.start_minute
 
     def gap(self, other: "TimeSlot") -> Optional["TimeSlot"]:
         """If slots are separated by a non-zero gap, return the gap as a new timeslot, else None"""
-        if self.end < other.start:
-            return TimeSlot(self.end, other.start)
-        elif other.end < self.start:
-            return TimeSlot(other.end, self.start)
+        if self.end_minute < other.start_minute:
+            return TimeSlot.from_minutes(self.end_minute, other.start_minute)
+        elif other.end_minute < self.start_minute:
+            return TimeSlot.from_minutes(other.end_minute, self.start_minute)
         else:
             return None
 
     def union(self, other: "TimeSlot") -> "TimeSlot":
         if not self.gap(other):
-            return TimeSlot(min(self.start, other.start), max(self.end, other.end))
+            return TimeSlot.from_minutes(min(self.start_minute, other.start_minute),
+                                         max(self.end_minute, other.end_minute))
         else:
             raise Exception("Time slots must not have a gap if they are to be unioned")
 
     def __hash__(self):
-        return hash(str(self.start.timestamp()) + str(self.end.timestamp()))
+        return hash((self.start_minute, self.end_minute))
 
 
 def get_daily_slots(start, end, slot, date):
     # combine start time to respective day
-    dt = datetime.combine(date.date(), start.time())
-    slots = set([TimeSlot(dt, dt + timedelta(minutes=slot))])
-    # increment current time by slot till the end time
-    while dt.time() < end.time():
-        dt = dt + timedelta(minutes=slot)
-        time_slot = TimeSlot(dt, dt + timedelta(minutes=slot))
-        slots.add(time_slot)
-    return slots
-
-
-def get_table_available_slots(table_id, reservation_time: datetime, db: Session):
-    table = restaurant_crud.get_table_by_id(table_id, db)
-    restaurant = restaurant_crud.get_restaurant_by_id(table.restaurant_id, db)
-    assert restaurant.open_hour <= reservation_time.hour < restaurant.close_hour, "Reservation should be be in open " \
-                                                                                  "hours only"
-    start_time = reservation_time.replace(hour=restaurant.open_hour, minute=0)
-    end_time = reservation_time.replace(hour=restaurant.close_hour, minute=0)
-    slot = 15
-    available_slots = set()
-    reserved_slots = set()
-    all_daily_slots = get_daily_slots(start_time, end_time, slot, reservation_time)
-    reservations = db.query(Reservation).filter(
-        Reservation.table_id == table.id,
-        cast(Reservation.start_time, Date) == reservation_time.date()
-    )
-    print(len(all_daily_slots))
-
-    for reservation in reservations:
-        reserved_slots.add(
-            TimeSlot(reservation.start_time.replace(tzinfo=None), reservation.end_time.replace(tzinfo=None)))
-    available_slots = all_daily_slots - reserved_slots
-    print(len(available_slots))
-    return available_slots
+    first = to_epoch_minutes(datetime.combine(date.date(), start.time()))
+    last = to_epoch_minutes(datetime.combine(date.date(), end.time()))
+    # slots start every ``slot`` minutes until one starts at or after the end time
+    count = max(0, -(-(last - first) // slot))
+    return {TimeSlot.from_minutes(minute, minute + slot) for minute in range(first, first + count * slot + 1, slot)}
+
+
+def get_table_available_slots(table_id, reservation_time: datetime, db: Session, refresh: bool = False) -> int:
+    """Bitmap of the slots of ``reservation_time``'s day in which the table is open and free.
+
+    ``refresh`` reads the table-day's occupancy row from the database instead of this worker's index.
+    """
+    table, restaurant = metadata_registry.table_with_restaurant(table_id, db)
+    occupied = availability_index.get(table.id, reservation_time.date(), db, refresh=refresh)
+    return opening_mask(restaurant.open_hour, restaurant.close_hour) & ~occupied
+
+
+def to_time_slots(day: date, slot_indexes: Iterable[int]) -> List[TimeSlot]:
+    """Builds the time slots of ``day`` at ``slot_indexes``, for API responses."""
+    midnight = to_epoch_minutes(datetime.combine(day, time.min))
+    return [TimeSlot.from_minutes(midnight + index * SLOT_MINUTES, midnight + (index + 1) * SLOT_MINUTES)
+            for index in slot_indexes]
+
+
+def get_restaurant_availability(restaurant, first_day: date, days: int, db: Session, party_size: int = None) \
+        -> List[dict]:
+    """Free slot indexes of every table of the restaurant, per day, from a single occupancy matrix.
+
+    Slots stay integers so the result is cheap to cache, ``expand_availability``
+    turns them into time slots for the response.
+    """
+    tables = metadata_registry.tables(restaurant.id, db, min_seats=party_size)
+    occupancy = build_occupancy_matrix([table.id for table in tables], first_day, days, db)
+    free_slots = free_slots_matrix(occupancy, restaurant.open_hour, restaurant.close_hour)
+    availability = []
+    for day_index, day_free_slots in enumerate(free_slots):
+        day = first_day + timedelta(days=day_index)
+        availability.append({
+            'date': day,
+            'tables': [{
+                'table_id': table.id,
+                'number_of_seats': table.number_of_seats,
+                'slots': np.flatnonzero(table_free_slots).tolist(),
+            } for table, table_free_slots in zip(tables, day_free_slots)],
+        })
+    return availability
+
+
+def expand_availability(availability: List[dict]) -> List[dict]:
+    """``get_restaurant_availability`` with time slots in place of slot indexes, dates may be ISO strings."""
+    expanded = []
+    for day_availability in availability:
+        day = day_availability['date']
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        expanded.append({
+            'date': day,
+            'tables': [{**table, 'slots': to_time_slots(day, table['slots'])} for table in day_availability['tables']],
+        })
+    return expanded
+
+
+def iter_free_table_slots(tables, open_hour: int, close_hour: int, start: datetime, days: int, db: Session) \
+        -> Iterator[dict]:
+    """Free ``(table, slot)`` pairs from ``start`` on, in time order and smallest fitting table first.
+
+    Occupancy comes from the worker's availability index, loaded ``SEARCH_WINDOW_DAYS``
+    at a time with one query per window, so a search that finds its slots early
+    reads neither the later days nor their reservations.
+    """
+    # Wall-clock time like the stored reservations and the opening hours
+    start = start.replace(tzinfo=None)
+    opening = opening_mask(open_hour, close_hour)
+    table_ids = [table.id for table in tables]
+    for window in range(0, days, SEARCH_WINDOW_DAYS):
+        window_days = [start.date() + timedelta(days=day)
+                       for day in range(window, min(window + SEARCH_WINDOW_DAYS, days))]
+        occupancy = availability_index.get_days(table_ids, window_days, db)
+        for day in window_days:
+            bookable = opening
+            if day == start.date():
+                # Slots that already started are not offered
+                first_slot = -(-(start - datetime.combine(day, time.min)).total_seconds() // SLOT_SECONDS)
+                bookable &= range_mask(int(first_slot), SLOTS_PER_DAY)
+            free = [(table, bookable & ~occupancy[(table.id, day)]) for table in tables]
+            any_free = 0
+            for _, table_free in free:
+                any_free |= table_free
+            for slot in iter_slots(any_free):
+                slot_start = datetime.combine(day, time.min) + timedelta(seconds=slot * SLOT_SECONDS)
+                for table, table_free in free:
+                    if table_free >> slot & 1:
+                        yield {
+                            'table_id': table.id,
+                            'number_of_seats': table.number_of_seats,
+                            'start': slot_start,
+                            'end': slot_start + timedelta(seconds=SLOT_SECONDS),
+                        }
 
 
+def find_next_available_slots(restaurant, party_size: int, start: datetime, days: int, limit: int, db: Session) \
+        -> List[dict]:
+    """The first ``limit`` bookable slots of tables seating ``party_size`` within ``days`` days of ``start``."""
+    tables = metadata_registry.tables(restaurant.id, db, min_seats=party_size)
+    return list(islice(iter_free_table_slots(tables, restaurant.open_hour, restaurant.close_hour, start, days, db),
+                       limit))
@@ -1,14 +1,18 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from app.dependencies import get_db
-from app.utils import get_model_or_404
+from app.bulk import BulkImportResult, parse_rows, validate_rows
+from app.core.config import settings
+from app.dependencies import get_async_db, get_async_read_db, get_redis
+from app.utils import run_in_session
+from reservation.availability_cache import invalidate_restaurant
 from restaurant_management import schemas
 import restaurant_management.crud as restaurant_crud
-from restaurant_management.models import Restaurant
+from restaurant_management.registry import get_restaurant_or_404, metadata_registry
 from users.roles import ADMIN_ROLE
 
 router = APIRouter(prefix="/v1/restaurants",
@@ -17,30 +21,60 @@ router = APIRouter(prefix="/v1/restaurants",
 
 
 @router.get("/", response_model=List[schemas.RestaurantDetailsSchema], dependencies=[Depends(ADMIN_ROLE)])
-def list_restaurant(db: Session = Depends(get_db)):
-    return restaurant_crud.get_restaurants(db)
+async def list_restaurant(db: AsyncSession = Depends(get_async_read_db)):
+    return await run_in_session(db, restaurant_crud.get_restaurants)
 
 
 @router.post("/", response_model=schemas.RestaurantDetailsSchema, status_code=status.HTTP_201_CREATED,
              dependencies=[Depends(ADMIN_ROLE)])
-def create_restaurant(restaurant_request: schemas.CreateRestaurant, db: Session = Depends(get_db)):
-    return restaurant_crud.create_restaurant(restaurant_request, db)
+async def create_restaurant(restaurant_request: schemas.CreateRestaurant, db: AsyncSession = Depends(get_async_db)):
+    return await run_in_session(db, restaurant_crud.create_restaurant, restaurant_request)
+
+
+@router.put("{restaurant_id}", response_model=schemas.RestaurantDetailsSchema, dependencies=[Depends(ADMIN_ROLE)])
+async def update_restaurant(restaurant_id: int, restaurant_request: schemas.CreateRestaurant,
+                            db: AsyncSession = Depends(get_async_db), redis: Redis = Depends(get_redis)):
+    _ = await run_in_session(db, get_restaurant_or_404, restaurant_id)
+    restaurant = await run_in_session(db, restaurant_crud.update_restaurant,
+                                      schemas.RestaurantDetailsSchema(id=restaurant_id, **restaurant_request.dict()))
+    # The opening hours shape every cached availability of the restaurant
+    await invalidate_restaurant(redis, restaurant_id)
+    return restaurant
 
 
 @router.get("{restaurant_id}/tables", response_model=List[schemas.TableDetailsSchema],
             dependencies=[Depends(ADMIN_ROLE)])
-def get_restaurant_tables(restaurant_id: int, db: Session = Depends(get_db)):
-    return restaurant_crud.get_tables_by_restaurant_id(restaurant_id, db)
+async def get_restaurant_tables(restaurant_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    return await run_in_session(db, restaurant_crud.get_tables_by_restaurant_id, restaurant_id)
 
 
 @router.post("/tables", response_model=schemas.TableDetailsSchema, status_code=status.HTTP_201_CREATED,
              dependencies=[Depends(ADMIN_ROLE)])
-def create_restaurant_table(restaurant_request: schemas.CreateTableSchema, db: Session = Depends(get_db)):
-    _ = get_model_or_404(Restaurant, restaurant_request.restaurant_id, db)
-    table = restaurant_crud.create_table(restaurant_request, db)
+async def create_restaurant_table(restaurant_request: schemas.CreateTableSchema,
+                                  db: AsyncSession = Depends(get_async_db), redis: Redis = Depends(get_redis)):
+    _ = await run_in_session(db, get_restaurant_or_404, restaurant_request.restaurant_id)
+    table = await run_in_session(db, restaurant_crud.create_table, restaurant_request)
+    await invalidate_restaurant(redis, table.restaurant_id)
     return table
 
 
+@router.post("/tables/bulk", response_model=BulkImportResult, dependencies=[Depends(ADMIN_ROLE)],
+             description="Imports a JSON array or NDJSON upload of tables, reporting rejected rows. "
+                         "Targets 10,000 rows/s on Postgres.")
+async def bulk_create_restaurant_tables(request: Request, db: AsyncSession = Depends(get_async_db),
+                                        redis: Redis = Depends(get_redis)):
+    rows, errors = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    tables, invalid = validate_rows(schemas.CreateTableSchema, rows)
+    inserted, rejected, restaurant_ids = await run_in_session(db, restaurant_crud.bulk_create_tables, tables,
+                                                              chunk_size=settings.BULK_IMPORT_CHUNK_SIZE)
+    await invalidate_restaurant(redis, *restaurant_ids)
+    return BulkImportResult(received=len(rows) + len(errors), inserted=inserted,
+                            errors=sorted(errors + invalid + rejected, key=lambda error: error.row))
+
+
 @router.delete("/tables/{table_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(ADMIN_ROLE)])
-def delete_restaurant_table(table_id: int, db: Session = Depends(get_db)):
-    restaurant_crud.delete_table_by_id(table_id, db)
+async def delete_restaurant_table(table_id: int, db: AsyncSession = Depends(get_async_db),
+                                  redis: Redis = Depends(get_redis)):
+    table = await run_in_session(db, metadata_registry.table, table_id)
+    if await run_in_session(db, restaurant_crud.delete_table_by_id, table_id):
+        await invalidate_restaurant(redis, table.restaurant_id)
@@ -1,8 +1,13 @@
-from typing import List
+from typing import List, Set, Tuple
 
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.bulk import RowError, chunked
+from reservation.allocation import table_allocator
 from restaurant_management import models
+from restaurant_management.registry import metadata_registry
 from restaurant_management.schemas import CreateRestaurant, RestaurantDetailsSchema, CreateTableSchema, \
     TableDetailsSchema
 
@@ -13,6 +18,7 @@ def create_restaurant(restaurant_request: CreateRestaurant, db: Session) -> Rest
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
+    metadata_registry.invalidate(db_item.id)
     return db_item
 
 
@@ -32,6 +38,7 @@ def update_restaurant(restaurant_request: RestaurantDetailsSchema, db: Session):
     db.add(restaurant)
     db.commit()
     db.refresh(restaurant)
+    metadata_registry.invalidate(restaurant.id)
     return restaurant
 
 
@@ -40,11 +47,16 @@ def create_table(table_request: CreateTableSchema, db: Session) -> TableDetailsS
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
+    metadata_registry.invalidate(db_item.restaurant_id)
+    table_allocator.invalidate(db_item.restaurant_id)
     return db_item
 
 
-def get_tables_by_restaurant_id(restaurant_id: int, db: Session) -> List[TableDetailsSchema]:
-    return db.query(models.Table).filter_by(restaurant_id=restaurant_id).all()
+def get_tables_by_restaurant_id(restaurant_id: int, db: Session, min_seats: int = None) -> List[TableDetailsSchema]:
+    query = db.query(models.Table).filter_by(restaurant_id=restaurant_id)
+    if min_seats:
+        query = query.filter(models.Table.number_of_seats >= min_seats)
+    return query.order_by(models.Table.number_of_seats, models.Table.id).all()
 
 
 def get_table_by_id(table_id: int, db: Session) -> TableDetailsSchema:
@@ -52,4 +64,53 @@ def get_table_by_id(table_id: int, db: Session) -> TableDetailsSchema:
 
 
 def delete_table_by_id(table_id: int, db: Session):
-    return db.query(models.Table).filter_by(id=table_id).delete()
+    table = db.query(models.Table).get(table_id)
+    if not table:
+        return 0
+    db.delete(table)
+    db.commit()
+    metadata_registry.invalidate(table.restaurant_id)
+    table_allocator.invalidate(table.restaurant_id)
+    return 1
+
+
+def bulk_create_tables(tables: List[Tuple[int, CreateTableSchema]], db: Session, chunk_size: int) \
+        -> Tuple[int, List[RowError], Set[int]]:
+    """Inserts numbered, validated rows with executemany, one transaction per chunk of ``chunk_size``.
+
+    Unknown restaurants and table numbers that are taken or repeated in the
+    upload are found with one query each per chunk. Returns the number of
+    inserted rows, the rejected rows and the ids of the restaurants that got
+    tables.
+    """
+    inserted, errors, restaurant_ids, numbers_seen = 0, [], set(), set()
+    for chunk in chunked(tables, chunk_size):
+        restaurants = {restaurant_id for restaurant_id, in db.query(models.Restaurant.id).filter(
+            models.Restaurant.id.in_({table.restaurant_id for _, table in chunk}))}
+        taken = {number for number, in db.query(models.Table.number).filter(
+            models.Table.number.in_({table.number for _, table in chunk}))}
+        accepted = []
+        for row, table in chunk:
+            if table.restaurant_id not in restaurants:
+                errors.append(RowError(row=row, detail=f"Restaurant {table.restaurant_id} does not exist."))
+            elif table.number in taken or table.number in numbers_seen:
+                errors.append(RowError(row=row, detail=f"Table number {table.number} already exists."))
+            else:
+                numbers_seen.add(table.number)
+                accepted.append((row, table))
+        if not accepted:
+            continue
+        try:
+            db.execute(insert(models.Table), [table.dict() for _, table in accepted])
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            errors.extend(RowError(row=row, detail="Conflicts with a concurrent write, retry the row.")
+                          for row, _ in accepted)
+            continue
+        inserted += len(accepted)
+        restaurant_ids.update(table.restaurant_id for _, table in accepted)
+    for restaurant_id in restaurant_ids:
+        metadata_registry.invalidate(restaurant_id)
+        table_allocator.invalidate(restaurant_id)
+    return inserted, errors, restaurant_ids
@@ -22,7 +22,7 @@ class Table(Base):
     __tablename__ = "tables"
 
     id = Column(Integer, primary_key=True, index=True)
-    restaurant_id = Column(Integer, ForeignKey("restaurants.id"))
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id"), index=True)
     number_of_seats = Column(SmallInteger)
     number = Column(Integer, unique=True)
 
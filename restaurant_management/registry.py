@@ -0,0 +1,128 @@
+"""Per-worker registry of restaurant and table metadata.
+
+Restaurants and their tables are loaded lazily, one restaurant at a time, into
+immutable records that are safe to share across requests and threads. The table
+write paths of ``restaurant_management.crud`` drop the restaurants they change,
+so only those are reloaded; entries are also reloaded after ``ttl`` seconds to
+pick up changes made by other workers.
+"""
+import threading
+import time as timer
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from starlette import status
+
+from app.core.config import settings
+from restaurant_management.models import Restaurant, Table
+
+
+class RestaurantInfo(NamedTuple):
+    id: int
+    name: str
+    open_hour: int
+    close_hour: int
+
+
+class TableInfo(NamedTuple):
+    id: int
+    restaurant_id: int
+    number_of_seats: int
+    number: int
+
+
+class RestaurantEntry:
+
+    def __init__(self, restaurant: RestaurantInfo, tables: List[TableInfo]):
+        self.restaurant = restaurant
+        # Ordered like ``get_tables_by_restaurant_id``, smallest table first
+        self.tables = sorted(tables, key=lambda table: (table.number_of_seats, table.id))
+        self.tables_by_id = {table.id: table for table in self.tables}
+        self.loaded_at = timer.monotonic()
+
+
+class MetadataRegistry:
+    """Restaurant and table metadata by id, read without I/O once loaded.
+
+    ``version`` is bumped by every invalidation. A load that started before an
+    invalidation is returned to its caller but not stored, so a slow load can't
+    put back data that a concurrent write just changed.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._restaurants: Dict[int, RestaurantEntry] = {}
+        self._table_restaurants: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def restaurant(self, restaurant_id: int, db: Session) -> Optional[RestaurantInfo]:
+        entry = self._entry(restaurant_id, db)
+        return entry.restaurant if entry else None
+
+    def tables(self, restaurant_id: int, db: Session, min_seats: int = None) -> List[TableInfo]:
+        """Tables of the restaurant seating at least ``min_seats``, smallest first."""
+        entry = self._entry(restaurant_id, db)
+        if not entry:
+            return []
+        return [table for table in entry.tables if not min_seats or table.number_of_seats >= min_seats]
+
+    def table(self, table_id: int, db: Session) -> Optional[TableInfo]:
+        table_and_restaurant = self.table_with_restaurant(table_id, db)
+        return table_and_restaurant[0] if table_and_restaurant else None
+
+    def table_with_restaurant(self, table_id: int, db: Session) -> Optional[Tuple[TableInfo, RestaurantInfo]]:
+        with self._lock:
+            restaurant_id = self._table_restaurants.get(table_id)
+        if restaurant_id is None:
+            # Loads the restaurant of an unknown table in the same single query
+            restaurant_id = db.query(Table.restaurant_id).filter(Table.id == table_id).scalar_subquery()
+        entry = self._entry(restaurant_id, db)
+        table = entry.tables_by_id.get(table_id) if entry else None
+        return (table, entry.restaurant) if table else None
+
+    def invalidate(self, restaurant_id: int = None):
+        with self._lock:
+            self.version += 1
+            if restaurant_id is None:
+                self._restaurants.clear()
+                self._table_restaurants.clear()
+                return
+            entry = self._restaurants.pop(restaurant_id, None)
+            for table_id in entry.tables_by_id if entry else ():
+                self._table_restaurants.pop(table_id, None)
+
+    def _entry(self, restaurant_id, db: Session) -> Optional[RestaurantEntry]:
+        """The entry of ``restaurant_id``, an id or a scalar subquery, loaded with one query when missing."""
+        with self._lock:
+            entry = self._restaurants.get(restaurant_id) if isinstance(restaurant_id, int) else None
+            version = self.version
+        if entry and timer.monotonic() - entry.loaded_at < self.ttl:
+            return entry
+        # Plain rows rather than ORM objects, which belong to the session that loaded them
+        rows = db.query(Restaurant.id, Restaurant.name, Restaurant.open_hour, Restaurant.close_hour,
+                        Table.id, Table.restaurant_id, Table.number_of_seats, Table.number).outerjoin(
+            Table, Table.restaurant_id == Restaurant.id).filter(Restaurant.id == restaurant_id).all()
+        if not rows:
+            return None
+        tables = [TableInfo(*row[4:]) for row in rows if row[4] is not None]
+        entry = RestaurantEntry(RestaurantInfo(*rows[0][:4]), tables)
+        with self._lock:
+            if self.version == version:
+                self._restaurants[entry.restaurant.id] = entry
+                self._table_restaurants.update(dict.fromkeys(entry.tables_by_id, entry.restaurant.id))
+        return entry
+
+
+def get_restaurant_or_404(restaurant_id: int, db: Session) -> RestaurantInfo:
+    restaurant = metadata_registry.restaurant(restaurant_id, db)
+    if not restaurant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Object with id: {restaurant_id} does not exist.",
+        )
+    return restaurant
+
+
+metadata_registry = MetadataRegistry(settings.METADATA_REGISTRY_TTL)
@@ -0,0 +1,133 @@
+"""Requests per second of the sync and async database paths.
+
+Serves the same reservation listing through a sync route using ``get_db`` (run in
+the threadpool) and an async route using an ``AsyncSession``, then drives both
+with concurrent in-process requests::
+
+    python -m tests.benchmarks.bench_async_db --requests 2000 --concurrency 100
+
+BENCH_DATABASE_URI selects the database (a sync SQLAlchemy URL, a temporary
+SQLite file by default); Postgres gives the representative numbers.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import reservation.crud as reservation_crud
+from app.database import Base
+from app.utils import run_in_session
+from reservation.models import Reservation
+from restaurant_management.models import Restaurant, Table
+from tests.conftest import async_database_uri
+
+
+def seed(engine, reservations: int) -> int:
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    restaurant = Restaurant(name="Benchmark restaurant", open_hour=0, close_hour=24)
+    session.add(restaurant)
+    session.flush()
+    tables = [Table(restaurant_id=restaurant.id, number_of_seats=4, number=restaurant.id * 1000 + number)
+              for number in range(10)]
+    session.add_all(tables)
+    session.flush()
+    start = datetime(2030, 1, 1)
+    session.add_all([Reservation(main_guest_name="Guest", number_of_customers=2, table_id=tables[index % 10].id,
+                                 start_time=start + timedelta(minutes=15 * (index // 10)),
+                                 end_time=start + timedelta(minutes=15 * (index // 10 + 1)))
+                     for index in range(reservations)])
+    session.commit()
+    restaurant_id = restaurant.id
+    session.close()
+    return restaurant_id
+
+
+def build_app(database_uri: str, pool_size: int) -> FastAPI:
+    if database_uri.startswith("sqlite"):
+        sync_engine = create_engine(database_uri, connect_args={"check_same_thread": False, "timeout": 30})
+        pool_options = {}
+    else:
+        pool_options = {"pool_size": pool_size, "max_overflow": 0}
+        sync_engine = create_engine(database_uri, **pool_options)
+    async_engine = create_async_engine(async_database_uri(database_uri), **pool_options)
+    sync_session = sessionmaker(bind=sync_engine)
+    async_session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    def get_db():
+        db = sync_session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with async_session() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync/{restaurant_id}")
+    def sync_reservations(restaurant_id: int, db: Session = Depends(get_db)):
+        return reservation_crud.get_reservations_page(restaurant_id, db, size=20)
+
+    @app.get("/async/{restaurant_id}")
+    async def async_reservations(restaurant_id: int, db: AsyncSession = Depends(get_async_db)):
+        return await run_in_session(db, reservation_crud.get_reservations_page, restaurant_id, size=20)
+
+    return app
+
+
+async def drive(app: FastAPI, path: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--reservations", type=int, default=5000)
+    args = parser.parse_args()
+
+    database_uri = os.environ.get("BENCH_DATABASE_URI") or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    restaurant_id = seed(create_engine(database_uri), args.reservations)
+    app = build_app(database_uri, pool_size=min(args.concurrency, 50))
+
+    print(f"{'path':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for path in ("sync", "async"):
+        result = asyncio.run(drive(app, f"/{path}/{restaurant_id}", args.requests, args.concurrency))
+        print(f"{path:<8}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
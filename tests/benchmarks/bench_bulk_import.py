@@ -0,0 +1,100 @@
+"""Rows per second of the bulk table and reservation imports.
+
+Uploads ``--tables`` tables and then a reservation per table for the next
+``--slots`` slots of a day as NDJSON, in-process::
+
+    python -m tests.benchmarks.bench_bulk_import --tables 500 --slots 40
+
+BENCH_DATABASE_URI selects the database (a sync SQLAlchemy URL, a temporary
+SQLite file by default). The target is 10,000 rows/s on Postgres.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import fakeredis
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.dependencies import get_async_db, get_redis
+from app.main import app
+from restaurant_management.models import Restaurant
+from tests.conftest import async_database_uri
+from users import get_current_active_user
+from users.schemas import UserSchema
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+def ndjson(rows) -> str:
+    return "\n".join(json.dumps(row) for row in rows)
+
+
+async def upload(client: httpx.AsyncClient, path: str, rows: list) -> float:
+    started = time.perf_counter()
+    response = await client.post(path, content=ndjson(rows), headers=NDJSON, timeout=None)
+    response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    result = response.json()
+    assert result["inserted"] == len(rows), result["errors"][:5]
+    return len(rows) / elapsed
+
+
+async def run(args):
+    database_uri = os.environ.get("BENCH_DATABASE_URI") or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(database_uri)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    restaurant = Restaurant(name="Bulk restaurant", open_hour=0, close_hour=24)
+    session.add(restaurant)
+    session.commit()
+    restaurant_id = restaurant.id
+    session.close()
+
+    async_session = sessionmaker(bind=create_async_engine(async_database_uri(database_uri)), class_=AsyncSession,
+                                 expire_on_commit=False)
+
+    async def get_bench_async_db():
+        async with async_session() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_bench_async_db
+    redis_server = fakeredis.FakeServer()
+    app.dependency_overrides[get_redis] = lambda: fakeredis.FakeAsyncRedis(server=redis_server)
+    app.dependency_overrides[get_current_active_user] = lambda: UserSchema(id=1, e_number=1000, is_active=True,
+                                                                          is_admin=True, role="employee")
+    day = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        tables = [{"restaurant_id": restaurant_id, "number_of_seats": 4, "number": restaurant_id * 100000 + number}
+                  for number in range(args.tables)]
+        tables_rate = await upload(client, "/v1/restaurants/tables/bulk", tables)
+        table_ids = [table["id"] for table in (await client.get(f"/v1/restaurants{restaurant_id}/tables")).json()]
+        reservations = [{
+            "main_guest_name": "Guest", "number_of_customers": 2, "table_id": table_id,
+            "start_time": (day + timedelta(minutes=15 * slot)).isoformat() + "+00:00",
+            "end_time": (day + timedelta(minutes=15 * (slot + 1))).isoformat() + "+00:00",
+        } for slot in range(args.slots) for table_id in table_ids]
+        reservations_rate = await upload(client, "/v1/reservations/bulk", reservations)
+
+    print(f"{'rows':<14}{'count':>8}{'rows/s':>10}")
+    print(f"{'tables':<14}{len(tables):>8}{tables_rate:>10.0f}")
+    print(f"{'reservations':<14}{len(reservations):>8}{reservations_rate:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=40)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Microbenchmarks of the code that runs on every request.
+
+Times each case with realistic data sizes against an in-memory SQLite database
+and compares the results to a saved baseline::
+
+    python -m tests.benchmarks.bench_hot_paths --save      # record the baseline
+    python -m tests.benchmarks.bench_hot_paths             # compare against it
+
+The comparison exits with status 1 when a case is slower than its baseline by
+more than ``--threshold`` (25% by default). Baselines are machine specific, so
+record one on the machine that runs the comparison.
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from reservation.availability import availability_index
+from reservation.models import Reservation
+from reservation.rebuild_occupancy import rebuild_occupancy
+from reservation.schemas import ReservationDetailsSchema
+from reservation.utils import TimeSlot, find_next_available_slots, get_daily_slots, get_restaurant_availability, \
+    get_table_available_slots
+from restaurant_management.models import Restaurant, Table
+from users import auth_service
+from users.schemas import UserSchema
+
+BASELINE = Path(__file__).with_name("baseline.json")
+DAY = date(2030, 1, 15)
+TABLES = 20
+RESERVATIONS_PER_TABLE_DAY = 20
+DAYS = 7
+
+
+def seed_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    restaurant = Restaurant(name="Benchmark restaurant", open_hour=10, close_hour=22)
+    db.add(restaurant)
+    db.flush()
+    tables = [Table(restaurant_id=restaurant.id, number_of_seats=2 + number % 6, number=number)
+              for number in range(TABLES)]
+    db.add_all(tables)
+    db.flush()
+    opening = datetime.combine(DAY, time(10))
+    db.add_all([Reservation(main_guest_name="Guest", number_of_customers=2, table_id=table.id,
+                            start_time=opening + timedelta(days=day, minutes=30 * slot),
+                            end_time=opening + timedelta(days=day, minutes=30 * slot + 15))
+                for table in tables for day in range(DAYS) for slot in range(RESERVATIONS_PER_TABLE_DAY)])
+    db.commit()
+    rebuild_occupancy(db)
+    return db, restaurant, tables
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    db, restaurant, tables = seed_session()
+    user = UserSchema(id=1, e_number=1000, is_active=True, is_admin=False, role="employee")
+    token = auth_service.create_access_token_for_user(user=user)
+    reservations = db.query(Reservation).limit(500).all()
+    opening, closing = datetime.combine(DAY, time(10)), datetime.combine(DAY, time(22))
+    moment = datetime.combine(DAY, time(12))
+    # Warm the index for the cached availability case
+    get_table_available_slots(tables[0].id, moment, db)
+
+    return {
+        "timeslot_construct_hash": lambda: {TimeSlot(opening + timedelta(minutes=15 * index),
+                                                     opening + timedelta(minutes=15 * (index + 1)))
+                                            for index in range(96)},
+        "timeslot_from_minutes_hash": lambda: {TimeSlot.from_minutes(minute, minute + 15)
+                                               for minute in range(0, 96 * 15, 15)},
+        "get_daily_slots": lambda: get_daily_slots(opening, closing, 15, opening),
+        "table_available_slots_index": lambda: get_table_available_slots(tables[0].id, moment, db),
+        "table_available_slots_database": lambda: get_table_available_slots(tables[1].id, moment, db, refresh=True),
+        "restaurant_availability_week": lambda: get_restaurant_availability(restaurant, DAY, DAYS, db),
+        # Found on the first day, from the index once the first call has loaded it
+        "next_available_slots": lambda: find_next_available_slots(restaurant, 6, opening, 14, 10, db),
+        "token_decode": lambda: auth_service.get_e_number_from_token(token=token),
+        "token_create": lambda: auth_service.create_access_token_for_user(user=user),
+        "serialize_500_reservations": lambda: jsonable_encoder(
+            [ReservationDetailsSchema.from_orm(reservation) for reservation in reservations]),
+    }
+
+
+def measure(function: Callable[[], object], repeat: int) -> float:
+    """Best time per call in seconds, over ``repeat`` runs of an auto-sized loop."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() and not args.save else {}
+    results, regressions = {}, []
+    print(f"{'case':<34}{'us/op':>12}{'baseline':>12}{'change':>9}")
+    for name, function in cases().items():
+        results[name] = measure(function, args.repeat)
+        line = f"{name:<34}{results[name] * 1e6:>12.2f}"
+        if name in baseline:
+            change = results[name] / baseline[name] - 1
+            line += f"{baseline[name] * 1e6:>12.2f}{change:>+9.0%}"
+            if change > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    availability_index.invalidate()
+
+    if args.save:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"Slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
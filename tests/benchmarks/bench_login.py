@@ -0,0 +1,98 @@
+"""Login throughput with the password hasher on a thread pool and on a process pool.
+
+Creates one user, then drives ``POST /v1/users/login`` with concurrent
+in-process requests for each executor kind::
+
+    python -m tests.benchmarks.bench_login --requests 200 --concurrency 50 --workers 4
+
+Requests rejected with 429 because the hasher queue is full are counted
+separately; raise ``--max-pending`` to queue them instead.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.dependencies import get_async_db
+from app.main import app
+from tests.conftest import async_database_uri
+from users.hashing import password_hasher
+
+USER = {"e_number": 4242, "password": "benchmark-password"}
+
+
+async def drive(client: httpx.AsyncClient, requests: int, concurrency: int) -> dict:
+    latencies, rejected = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal rejected
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.post("/v1/users/login", json=USER)
+            if response.status_code == 429:
+                rejected += 1
+                continue
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p99_ms": latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000 if latencies else 0,
+        "rejected": rejected,
+    }
+
+
+async def run(args) -> None:
+    database_uri = os.environ.get("BENCH_DATABASE_URI") or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    Base.metadata.create_all(bind=create_engine(database_uri))
+    async_session = sessionmaker(bind=create_async_engine(async_database_uri(database_uri)), class_=AsyncSession,
+                                 expire_on_commit=False)
+
+    async def get_bench_async_db():
+        async with async_session() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_bench_async_db
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        (await client.post("/v1/users/", json=USER)).raise_for_status()
+
+        print(f"{'executor':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'429s':>8}")
+        for kind in ("thread", "process"):
+            # Reconfigures the hasher the login route uses, its pool is recreated on first use
+            password_hasher.shutdown()
+            password_hasher.kind, password_hasher.workers = kind, args.workers
+            password_hasher.max_pending = args.max_pending
+            result = await drive(client, args.requests, args.concurrency)
+            print(f"{kind:<10}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                  f"{result['rejected']:>8}")
+        password_hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-pending", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""End-to-end load test of the booking, slot calculator and listing endpoints.
+
+Boots the app in-process (through httpx's ASGI transport) or under uvicorn on a
+local port, against SQLite or Postgres and an in-memory fake Redis. It seeds
+restaurants, tables and users, signs real tokens, runs a scenario with
+concurrent clients, and prints throughput, percentiles and a latency histogram
+per endpoint::
+
+    python -m tests.benchmarks.load_test --scenario booking-storm --concurrency 50 --requests 2000
+    python -m tests.benchmarks.load_test --scenario front-desk --server uvicorn --duration 30
+
+Scenarios:
+    booking-storm   every client books random slots of the same day, most of them contended
+    front-desk      clients poll today's reservations, the slot calculator and availability
+    mixed           front-desk polling with one booking in five requests
+
+Latencies and histograms only cover 2xx responses, the others are counted in
+the errors and statuses columns. Contended bookings are expected to be
+rejected with 404.
+
+LOAD_DATABASE_URI selects the database (a sync SQLAlchemy URL, a temporary
+SQLite file by default).
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import fakeredis
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.dependencies import get_async_db, get_redis
+from app.main import app
+from restaurant_management.models import Restaurant, Table
+from tests.conftest import async_database_uri
+from users import auth_service
+from users.models import User
+from users.schemas import UserSchema
+
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+# Endpoints behind ADMIN_ROLE, always requested with the admin token
+ADMIN_ENDPOINTS = {"listing"}
+
+
+class Fixture:
+    """Seeded restaurants and tables, and the tokens of an admin and the employees."""
+
+    def __init__(self, engine, restaurants: int, tables: int, users: int):
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine, expire_on_commit=False)()
+        # One bcrypt hash for everyone, the load test measures requests and not seeding
+        password = auth_service.create_salt_and_hashed_password(plaintext_password="load-test-password")
+        now = datetime.now()
+        accounts = [User(e_number=1000 + index, hashed_password=password.password, salt=password.salt,
+                         is_admin=index == 0, created_at=now, updated_at=now) for index in range(users + 1)]
+        session.add_all(accounts)
+        self.restaurants = [Restaurant(name=f"Restaurant {index}", open_hour=10, close_hour=22)
+                            for index in range(restaurants)]
+        session.add_all(self.restaurants)
+        session.flush()
+        self.tables = {restaurant.id: [Table(restaurant_id=restaurant.id, number_of_seats=2 + number % 5,
+                                             number=restaurant.id * 1000 + number) for number in range(tables)]
+                       for restaurant in self.restaurants}
+        session.add_all([table for tables in self.tables.values() for table in tables])
+        session.commit()
+        tokens = [auth_service.create_access_token_for_user(user=UserSchema.from_orm(user)) for user in accounts]
+        self.admin_token, self.employee_tokens = tokens[0], tokens[1:]
+        session.close()
+        self.day = (datetime.now() + timedelta(days=1)).date()
+
+    def random_table(self):
+        restaurant = random.choice(self.restaurants)
+        return restaurant, random.choice(self.tables[restaurant.id])
+
+    def random_slot(self):
+        start = datetime(self.day.year, self.day.month, self.day.day, 10) + timedelta(minutes=15 * random.randrange(48))
+        return start, start + timedelta(minutes=15)
+
+
+def booking(fixture: Fixture):
+    restaurant, table = fixture.random_table()
+    start, end = fixture.random_slot()
+    return "book", "POST", "/v1/reservations/", {
+        "main_guest_name": "Load test",
+        # A full table is never reported as having a better allocation
+        "number_of_customers": table.number_of_seats,
+        "table_id": table.id,
+        "start_time": start.isoformat() + "+00:00",
+        "end_time": end.isoformat() + "+00:00",
+    }
+
+
+def front_desk(fixture: Fixture):
+    restaurant, table = fixture.random_table()
+    return random.choice([
+        ("today", "GET", f"/v1/reservations{restaurant.id}/today", None),
+        ("listing", "GET", f"/v1/reservations{restaurant.id}/", None),
+        ("slots", "POST", f"/v1/reservations{restaurant.id}/tables/{table.id}",
+         {"date": datetime.combine(fixture.day, datetime.min.time()).isoformat()}),
+        ("availability", "POST", f"/v1/reservations{restaurant.id}/availability",
+         {"start_date": fixture.day.isoformat()}),
+    ])
+
+
+SCENARIOS = {
+    "booking-storm": booking,
+    "front-desk": front_desk,
+    "mixed": lambda fixture: booking(fixture) if random.random() < 0.2 else front_desk(fixture),
+}
+
+
+async def run_scenario(client: httpx.AsyncClient, fixture: Fixture, scenario, concurrency: int, requests: int,
+                       duration: float) -> tuple:
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    remaining = iter(range(requests)) if requests else None
+    deadline = time.perf_counter() + duration
+
+    async def worker(token):
+        while (next(remaining, None) is not None) if remaining else time.perf_counter() < deadline:
+            name, method, path, body = scenario(fixture)
+            headers = {"Authorization": f"Bearer {fixture.admin_token if name in ADMIN_ENDPOINTS else token}"}
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                status = response.status_code
+            except httpx.HTTPError as error:
+                status = type(error).__name__
+            if status in range(200, 300):
+                latencies[name].append(time.perf_counter() - started)
+            statuses[name][status] += 1
+
+    started = time.perf_counter()
+    tokens = [fixture.admin_token, *fixture.employee_tokens]
+    await asyncio.gather(*(worker(tokens[index % len(tokens)]) for index in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def report(latencies: dict, statuses: dict, elapsed: float):
+    total = sum(sum(counts.values()) for counts in statuses.values())
+    print(f"\n{total} requests in {elapsed:.1f}s, {total / elapsed:.1f} req/s\n")
+    print(f"{'endpoint':<14}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}  statuses")
+    for name, counts in sorted(statuses.items()):
+        values = sorted(latencies[name])
+        codes = " ".join(f"{code}:{count}" for code, count in sorted(counts.items(), key=str))
+        timings = "".join(f"{value * 1000:>9.1f}" for value in (
+            statistics.median(values), percentile(values, 0.9), percentile(values, 0.99), values[-1])) \
+            if values else f"{'-':>9}" * 4
+        count = sum(counts.values())
+        print(f"{name:<14}{count:>8}{count - len(values):>8}{count / elapsed:>9.1f}{timings}  {codes}")
+
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        if not values:
+            continue
+        counts = Counter(next(index for index, edge in enumerate(BUCKETS_MS) if value * 1000 <= edge)
+                         for value in values)
+        widest = max(counts.values())
+        print(f"\n{name} latency histogram")
+        for index, edge in enumerate(BUCKETS_MS):
+            if counts[index]:
+                label = f"<= {edge:g} ms" if edge != float("inf") else f"> {BUCKETS_MS[-2]:g} ms"
+                print(f"  {label:>12} {'#' * max(1, 40 * counts[index] // widest):<40} {counts[index]}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def main_async(args):
+    database_uri = os.environ.get("LOAD_DATABASE_URI") or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    fixture = Fixture(create_engine(database_uri), args.restaurants, args.tables, args.users)
+
+    pool_options = {} if database_uri.startswith("sqlite") else {"pool_size": min(args.concurrency, 50)}
+    async_session = sessionmaker(bind=create_async_engine(async_database_uri(database_uri), **pool_options),
+                                 class_=AsyncSession, expire_on_commit=False)
+    redis_server = fakeredis.FakeServer()
+
+    async def get_load_async_db():
+        async with async_session() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_load_async_db
+    app.dependency_overrides[get_redis] = lambda: fakeredis.FakeAsyncRedis(server=redis_server)
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.server == "uvicorn":
+        port = free_port()
+        server, thread = await asyncio.get_running_loop().run_in_executor(None, start_uvicorn, port)
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30)
+    else:
+        server = None
+        client = httpx.AsyncClient(app=app, base_url="http://load-test", limits=limits, timeout=30)
+
+    print(f"{args.scenario}: {args.concurrency} clients, {len(fixture.restaurants)} restaurants, "
+          f"{args.tables} tables each, {args.server} server, {database_uri.split(':')[0]}")
+    try:
+        async with client:
+            results = await run_scenario(client, fixture, SCENARIOS[args.scenario], args.concurrency, args.requests,
+                                         args.duration)
+    finally:
+        if server:
+            server.should_exit = True
+            thread.join()
+    report(*results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=0, help="total requests, 0 runs for --duration")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run when --requests is 0")
+    parser.add_argument("--restaurants", type=int, default=5)
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
+import os
+
+import fakeredis
 import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
-from users import auth_service
+from app.database import Base
+from app.dependencies import get_async_db, get_redis
+from app.main import app
+from reservation.allocation import table_allocator
+from reservation.availability import availability_index
+from reservation.availability_cache import availability_cache
+from restaurant_management.models import Restaurant, Table
+from restaurant_management.registry import metadata_registry
+from users import auth_service, get_current_active_user
 from users.schemas import UserSchema, UserCreate
 
 
@@ -28,3 +44,92 @@ def dummy_user(auth_obj) -> UserSchema:
         update={'salt': new_password.salt, 'hashed_password': new_password.password, 'id': 2, 'is_active': True,
                 'is_admin': False})
     return UserSchema(**new_user_params.dict())
+
+
+# Defaults to a per-test SQLite file, shared by the sync session and the async app session
+TEST_DATABASE_URI = os.environ.get("TEST_DATABASE_URI")
+
+
+def async_database_uri(uri: str) -> str:
+    scheme, _, rest = uri.partition("://")
+    driver = "aiosqlite" if scheme.startswith("sqlite") else "asyncpg"
+    return f"{scheme.split('+')[0]}+{driver}://{rest}"
+
+
+@pytest.fixture
+def database_uri(tmp_path):
+    return TEST_DATABASE_URI or f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def engine(database_uri):
+    connect_args = {"check_same_thread": False, "timeout": 30} if database_uri.startswith("sqlite") else {}
+    engine = create_engine(database_uri, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def async_engine(database_uri, engine):
+    # The test client runs every request on a new event loop, so connections can't be pooled
+    return create_async_engine(async_database_uri(database_uri), poolclass=NullPool)
+
+
+@pytest.fixture(autouse=True)
+def clear_worker_caches():
+    # Every test gets a fresh database, so ids are reused across tests
+    yield
+    availability_index.invalidate()
+    table_allocator.invalidate()
+    metadata_registry.invalidate()
+    availability_cache.local.clear()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def restaurant_table(db):
+    restaurant = Restaurant(name="Test restaurant", open_hour=10, close_hour=22)
+    db.add(restaurant)
+    db.flush()
+    table = Table(restaurant_id=restaurant.id, number_of_seats=4, number=1)
+    db.add(table)
+    db.commit()
+    return table
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis(redis_server):
+    return fakeredis.FakeAsyncRedis(server=redis_server)
+
+
+@pytest.fixture
+def client(async_engine, redis_server):
+    admin = UserSchema(id=1, e_number=1000, is_active=True, is_admin=True, role="employee")
+    async_session = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine,
+                                 class_=AsyncSession)
+
+    async def get_test_async_db():
+        async with async_session() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = get_test_async_db
+    # A client per request, the test client runs every request on a new event loop
+    app.dependency_overrides[get_redis] = lambda: fakeredis.FakeAsyncRedis(server=redis_server)
+    app.dependency_overrides[get_current_active_user] = lambda: admin
+    yield TestClient(app)
+    app.dependency_overrides.clear()
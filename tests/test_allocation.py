@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import reservation.crud as reservation_crud
+from app.core.config import settings
+from app.core.queries import assert_max_queries
+from reservation.allocation import RestaurantTables, table_allocator
+from reservation.availability import availability_index, refresh_occupancy
+from reservation.models import Reservation
+from restaurant_management.models import Table
+
+START = datetime(2030, 1, 15, 12, 0, tzinfo=timezone.utc)
+END = datetime(2030, 1, 15, 12, 15, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def floor(db, restaurant_table):
+    """Tables of 2, 4 (``restaurant_table``), 4 and 8 seats."""
+    tables = [restaurant_table]
+    for number, seats in ((2, 2), (3, 4), (4, 8)):
+        table = Table(restaurant_id=restaurant_table.restaurant_id, number_of_seats=seats, number=number)
+        db.add(table)
+        tables.append(table)
+    db.commit()
+    return {table.number: table for table in tables}
+
+
+def occupy(db, table):
+    db.add(Reservation(main_guest_name="Guest", number_of_customers=2, table_id=table.id,
+                       start_time=START.replace(tzinfo=None), end_time=END.replace(tzinfo=None)))
+    db.flush()
+    refresh_occupancy({(table.id, START.date())}, db)
+    db.commit()
+
+
+def book_best_table(client, restaurant_id, party_size, start=START, end=END):
+    return client.post(f"/v1/reservations{restaurant_id}/best-table", json={
+        "main_guest_name": "Guest",
+        "number_of_customers": party_size,
+        "start_time": start.isoformat(),
+        "end_time": end.isoformat(),
+    })
+
+
+class TestRestaurantTables:
+
+    def test_fitting_tables_smallest_first(self, floor):
+        tables = RestaurantTables(list(floor.values()))
+        assert list(tables.fitting(3)) == [[floor[1].id, floor[3].id], [floor[4].id]]
+        assert list(tables.fitting(2, max_seats=8)) == [[floor[2].id], [floor[1].id, floor[3].id]]
+        assert list(tables.fitting(9)) == []
+
+
+class TestTableAllocator:
+
+    def test_skips_occupied_tables(self, db, floor):
+        occupy(db, floor[1])
+        free_tables = table_allocator.free_tables(floor[1].restaurant_id, 3, START, END, db)
+        assert list(free_tables) == [floor[3].id, floor[4].id]
+
+    def test_limit_stops_at_the_first_bucket_with_a_free_table(self, db, floor):
+        occupy(db, floor[1])
+        restaurant_id = floor[1].restaurant_id
+        assert table_allocator.free_tables(restaurant_id, 3, START, END, db, limit=1) == [floor[3].id]
+        assert (floor[4].id, START.date()) not in availability_index._bitmaps
+        assert table_allocator.free_tables(restaurant_id, 3, START, END, db, limit=1, exclude={floor[3].id}) \
+               == [floor[4].id]
+
+    def test_book_best_table(self, db, client, floor):
+        restaurant_id = floor[1].restaurant_id
+        booked = [book_best_table(client, restaurant_id, 4).json()["table_id"] for _ in range(3)]
+        assert booked == [floor[1].id, floor[3].id, floor[4].id]
+        assert book_best_table(client, restaurant_id, 4).status_code == 404
+
+    @pytest.mark.parametrize("start,end", [(START.replace(hour=23), END.replace(hour=23)),
+                                           (START.replace(minute=5), END.replace(minute=20))])
+    def test_unbookable_times_fail_before_trying_tables(self, client, async_engine, floor, start, end):
+        # Only the restaurant is loaded
+        with assert_max_queries(1, async_engine.sync_engine):
+            assert book_best_table(client, floor[1].restaurant_id, 2, start, end).status_code == 404
+
+    def test_lost_races_are_retried_a_few_times(self, client, floor, monkeypatch):
+        attempts = []
+        monkeypatch.setattr(reservation_crud, "book_reservation",
+                            lambda request, *args, **kwargs: attempts.append(request.table_id))
+        assert book_best_table(client, floor[1].restaurant_id, 2).status_code == 404
+        assert attempts == [floor[2].id, floor[1].id, floor[3].id][:settings.BEST_TABLE_ATTEMPTS]
+
+    def test_explicit_table_reports_better_allocation(self, client, floor):
+        response = client.post("/v1/reservations/", json={
+            "main_guest_name": "Guest",
+            "number_of_customers": 2,
+            "table_id": floor[4].id,
+            "start_time": START.isoformat(),
+            "end_time": END.isoformat(),
+        })
+        assert response.status_code == 400
+        assert str(floor[2].id) in response.json()["detail"]
+
+    def test_new_tables_are_allocated(self, db, client, floor):
+        table_allocator.tables(floor[1].restaurant_id, db)
+        response = client.post("/v1/restaurants/tables", json={
+            "restaurant_id": floor[1].restaurant_id, "number_of_seats": 3, "number": 5})
+        assert response.status_code == 201
+        assert book_best_table(client, floor[1].restaurant_id, 3).json()["table_id"] == response.json()["id"]
@@ -0,0 +1,127 @@
+from datetime import date, datetime, timedelta, timezone
+
+from app.core.queries import count_queries
+import reservation.crud as reservation_crud
+from reservation.availability import AvailabilityIndex, availability_index, is_bookable, iter_slots, opening_mask, \
+    slot_of, span_mask
+from reservation.schemas import CreateReservationSchema, FindNextAvailableSlots
+from reservation.utils import find_next_available_slots, get_table_available_slots, to_time_slots
+from restaurant_management.models import Restaurant, Table
+
+DAY = date(2030, 1, 15)
+
+
+def reserve(db, table, hour, minute):
+    return reservation_crud.create_reservation(CreateReservationSchema(
+        main_guest_name="Guest",
+        number_of_customers=2,
+        table_id=table.id,
+        start_time=datetime(2030, 1, 15, hour, minute, tzinfo=timezone.utc),
+        end_time=datetime(2030, 1, 15, hour, minute + 15, tzinfo=timezone.utc),
+    ), db)
+
+
+class TestBitmaps:
+
+    def test_span_mask_covers_overlapped_slots(self):
+        assert span_mask(datetime(2030, 1, 15, 0, 0), datetime(2030, 1, 15, 0, 15)) == 0b1
+        assert span_mask(datetime(2030, 1, 15, 0, 10), datetime(2030, 1, 15, 0, 25)) == 0b11
+        assert span_mask(datetime(2030, 1, 15, 23, 45), datetime(2030, 1, 16, 0, 15)) == 1 << 95
+
+    def test_opening_mask(self):
+        assert list(iter_slots(opening_mask(10, 11))) == [40, 41, 42, 43]
+
+    def test_is_bookable_requires_aligned_free_slot(self):
+        available = opening_mask(10, 11)
+        assert is_bookable(available, datetime(2030, 1, 15, 10, 15), datetime(2030, 1, 15, 10, 30))
+        assert not is_bookable(available, datetime(2030, 1, 15, 10, 5), datetime(2030, 1, 15, 10, 20))
+        assert not is_bookable(available, datetime(2030, 1, 15, 11, 0), datetime(2030, 1, 15, 11, 15))
+        taken = available & ~span_mask(datetime(2030, 1, 15, 10, 15), datetime(2030, 1, 15, 10, 30))
+        assert not is_bookable(taken, datetime(2030, 1, 15, 10, 15), datetime(2030, 1, 15, 10, 30))
+
+    def test_index_evicts_least_recently_used(self, db, restaurant_table):
+        index = AvailabilityIndex(max_entries=1, ttl=60)
+        index.get(restaurant_table.id, DAY, db)
+        index.get(restaurant_table.id, date(2030, 1, 16), db)
+        assert list(index._bitmaps) == [(restaurant_table.id, date(2030, 1, 16))]
+
+
+class TestTableAvailableSlots:
+
+    def test_all_opening_hours_free(self, db, restaurant_table):
+        slots = get_table_available_slots(restaurant_table.id, datetime(2030, 1, 15, 12), db)
+        time_slots = to_time_slots(DAY, iter_slots(slots))
+        assert len(time_slots) == 12 * 4
+        assert time_slots[0].start == datetime(2030, 1, 15, 10, 0)
+        assert time_slots[-1].end == datetime(2030, 1, 15, 22, 0)
+
+    def test_reservations_update_index(self, db, restaurant_table):
+        get_table_available_slots(restaurant_table.id, datetime(2030, 1, 15), db)
+        created = reserve(db, restaurant_table, 12, 30)
+        slots = get_table_available_slots(restaurant_table.id, datetime(2030, 1, 15), db)
+        assert slot_of(datetime(2030, 1, 15, 12, 30)) not in set(iter_slots(slots))
+
+        reservation_crud.delete_reservation_by_id(created.id, db)
+        slots = get_table_available_slots(restaurant_table.id, datetime(2030, 1, 15), db)
+        assert slot_of(datetime(2030, 1, 15, 12, 30)) in set(iter_slots(slots))
+
+    def test_refresh_reads_committed_reservations(self, db, restaurant_table):
+        reserve(db, restaurant_table, 13, 0)
+        get_table_available_slots(restaurant_table.id, datetime(2030, 1, 15), db)
+        # Simulates another worker cancelling the reservation
+        db.execute("DELETE FROM reservations")
+        db.execute("DELETE FROM table_day_occupancy")
+        db.commit()
+        assert get_table_available_slots(restaurant_table.id, datetime(2030, 1, 15), db) != \
+               opening_mask(10, 22) & ~availability_index.get(restaurant_table.id, DAY, db, refresh=True)
+
+
+class TestNextAvailableSlots:
+
+    def test_skips_reserved_and_started_slots(self, db, restaurant_table):
+        reserve(db, restaurant_table, 12, 15)
+        restaurant = db.query(Restaurant).get(restaurant_table.restaurant_id)
+        found = find_next_available_slots(restaurant, 4, datetime(2030, 1, 15, 12, 5), 14, 2, db=db)
+        assert [(slot["table_id"], slot["start"]) for slot in found] == [
+            (restaurant_table.id, datetime(2030, 1, 15, 12, 30)), (restaurant_table.id, datetime(2030, 1, 15, 12, 45))]
+
+    def test_smallest_fitting_table_first(self, db, restaurant_table):
+        restaurant = db.query(Restaurant).get(restaurant_table.restaurant_id)
+        large = Table(restaurant_id=restaurant.id, number_of_seats=8, number=2)
+        small = Table(restaurant_id=restaurant.id, number_of_seats=2, number=3)
+        db.add_all([large, small])
+        db.commit()
+        found = find_next_available_slots(restaurant, 3, datetime(2030, 1, 15, 21, 45), 2, 3, db=db)
+        assert [(slot["table_id"], slot["start"]) for slot in found] == [
+            (restaurant_table.id, datetime(2030, 1, 15, 21, 45)), (large.id, datetime(2030, 1, 15, 21, 45)),
+            (restaurant_table.id, datetime(2030, 1, 16, 10, 0))]
+
+    def test_stops_at_the_first_window_with_enough_slots(self, db, restaurant_table, engine):
+        restaurant = db.query(Restaurant).get(restaurant_table.restaurant_id)
+        with count_queries(engine) as statements:
+            find_next_available_slots(restaurant, 2, datetime(2030, 1, 15), 31, 10, db=db)
+        # The tables and a single window of reservations
+        assert statements.count == 2
+
+    def test_api_returns_bookable_slots(self, client, restaurant_table):
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/next-available",
+                               json={"party_size": 4, "start": "2030-01-15T23:00:00+00:00", "limit": 1})
+        assert response.status_code == 200
+        assert response.json() == [{"table_id": restaurant_table.id, "number_of_seats": 4,
+                                    "start": "2030-01-16T10:00:00", "end": "2030-01-16T10:15:00"}]
+        assert client.post(f"/v1/reservations{restaurant_table.restaurant_id}/next-available",
+                           json={"party_size": 5}).json() == []
+
+    def test_offsets_keep_the_wall_clock_time_of_bookings(self, client, restaurant_table):
+        response = client.post("/v1/reservations/", json={
+            "main_guest_name": "Guest", "number_of_customers": 4, "table_id": restaurant_table.id,
+            "start_time": "2030-01-15T12:00:00+02:00", "end_time": "2030-01-15T12:15:00+02:00"})
+        assert response.json()["start_time"] == "2030-01-15T12:00:00"
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/next-available",
+                               json={"party_size": 4, "start": "2030-01-15T12:00:00+02:00", "limit": 1})
+        assert [slot["start"] for slot in response.json()] == ["2030-01-15T12:15:00"]
+
+    def test_past_starts_are_clamped_in_their_own_zone(self):
+        zone = timezone(timedelta(hours=14))
+        start = FindNextAvailableSlots(party_size=2, start=datetime.now(zone) - timedelta(hours=1)).start
+        assert abs(start - datetime.now(zone).replace(tzinfo=None)) < timedelta(minutes=1)
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+from redis.asyncio import Redis
+
+from app.dependencies import get_redis
+from app.main import app
+from reservation.availability_cache import CACHE_HEADER, availability_cache
+
+BOOKING = {
+    "main_guest_name": "Guest",
+    "number_of_customers": 4,
+    "start_time": "2030-01-15T12:00:00+00:00",
+    "end_time": "2030-01-15T12:15:00+00:00",
+}
+NOON = datetime(2030, 1, 15, 12, 0).isoformat()
+
+
+def table_slots(client, table):
+    response = client.post(f"/v1/reservations{table.restaurant_id}/tables/{table.id}",
+                           json={"date": "2030-01-15T00:00:00"})
+    assert response.status_code == 200
+    return response.headers[CACHE_HEADER], [slot["start"] for slot in response.json()]
+
+
+def restaurant_slots(client, table):
+    response = client.post(f"/v1/reservations{table.restaurant_id}/availability",
+                           json={"start_date": "2030-01-15"})
+    assert response.status_code == 200
+    return response.headers[CACHE_HEADER], [slot["start"] for slot in response.json()[0]["tables"][0]["slots"]]
+
+
+@pytest.mark.parametrize("slots", [table_slots, restaurant_slots])
+class TestAvailabilityCache:
+
+    def test_repeated_reads_hit(self, client, restaurant_table, slots):
+        first, second = slots(client, restaurant_table), slots(client, restaurant_table)
+        assert (first[0], second[0]) == ("Miss", "Hit")
+        assert first[1] == second[1] and NOON in first[1]
+
+    def test_booking_is_never_served_stale(self, client, restaurant_table, slots):
+        slots(client, restaurant_table)
+        assert slots(client, restaurant_table)[0] == "Hit"
+        reservation = client.post("/v1/reservations/", json={**BOOKING, "table_id": restaurant_table.id})
+        assert reservation.status_code == 201
+
+        # The entry of the previous version is still in the L1 but is no longer reachable
+        assert len(availability_cache.local)
+        header, booked = slots(client, restaurant_table)
+        assert header == "Miss" and NOON not in booked
+        assert slots(client, restaurant_table) == ("Hit", booked)
+
+        assert client.delete(f"/v1/reservations/{reservation.json()['id']}").status_code == 204
+        header, released = slots(client, restaurant_table)
+        assert header == "Miss" and NOON in released
+
+    def test_opening_hours_change_is_never_served_stale(self, client, restaurant_table, slots):
+        slots(client, restaurant_table)
+        assert slots(client, restaurant_table)[0] == "Hit"
+        response = client.put(f"/v1/restaurants{restaurant_table.restaurant_id}",
+                              json={"name": "Test restaurant", "open_hour": 12, "close_hour": 22})
+        assert response.status_code == 200 and response.json()["open_hour"] == 12
+
+        header, opened_later = slots(client, restaurant_table)
+        assert header == "Miss" and opened_later[0] == NOON
+
+    def test_unreachable_redis_bypasses_cache(self, client, restaurant_table, slots):
+        app.dependency_overrides[get_redis] = lambda: Redis.from_url("redis://127.0.0.1:1",
+                                                                     socket_connect_timeout=0.1)
+        assert slots(client, restaurant_table)[0] == "Miss"
+        assert slots(client, restaurant_table)[0] == "Miss"
+        assert len(availability_cache.local) == 0
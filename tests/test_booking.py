@@ -0,0 +1,90 @@
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import reservation.crud as reservation_crud
+from reservation.models import Reservation
+from reservation.schemas import CreateReservationSchema
+from restaurant_management.models import Restaurant, Table
+
+WORKERS = 16
+
+
+def booking_request(table_id, hour=12, minute=0):
+    return CreateReservationSchema(
+        main_guest_name="Guest",
+        number_of_customers=2,
+        table_id=table_id,
+        start_time=datetime(2030, 1, 15, hour, minute, tzinfo=timezone.utc),
+        end_time=datetime(2030, 1, 15, hour, minute + 15, tzinfo=timezone.utc),
+    )
+
+
+@pytest.fixture
+def restaurant_and_table(engine):
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+    restaurant = Restaurant(name="Busy restaurant", open_hour=10, close_hour=22)
+    session.add(restaurant)
+    session.flush()
+    table = Table(restaurant_id=restaurant.id, number_of_seats=4, number=1)
+    session.add(table)
+    session.commit()
+    session.close()
+    return restaurant, table
+
+
+class TestBookReservation:
+
+    def test_concurrent_bookings_of_a_slot_never_double_book(self, engine, restaurant_and_table):
+        restaurant, table = restaurant_and_table
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        barrier = threading.Barrier(WORKERS)
+        results = []
+
+        def book(hour, minute):
+            session = Session()
+            try:
+                barrier.wait()
+                results.append(reservation_crud.book_reservation(booking_request(table.id, hour, minute),
+                                                                 restaurant, session))
+            finally:
+                session.close()
+
+        # Half of the workers race for 12:00, the other half for 12:15
+        threads = [threading.Thread(target=book, args=(12, 15 * (index % 2))) for index in range(WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        session = Session()
+        booked = session.query(Reservation.start_time).filter_by(table_id=table.id).all()
+        session.close()
+        assert len(results) == WORKERS
+        assert len([result for result in results if result]) == 2
+        assert sorted(start_time for start_time, in booked) == [datetime(2030, 1, 15, 12, 0),
+                                                                datetime(2030, 1, 15, 12, 15)]
+
+    def test_booking_round_trips(self, async_engine, client, restaurant_table):
+        statements = []
+        event.listen(async_engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        response = client.post("/v1/reservations/", json={
+            "main_guest_name": "Guest",
+            "number_of_customers": 4,
+            "table_id": restaurant_table.id,
+            "start_time": "2030-01-15T12:00:00+00:00",
+            "end_time": "2030-01-15T12:15:00+00:00",
+        })
+        assert response.status_code == 201
+        # Table and restaurant, better allocation check, (advisory lock,) table-day reservations, insert
+        assert len(statements) <= 5, statements
+
+    def test_unavailable_slot(self, db, restaurant_table):
+        restaurant = db.query(Restaurant).get(restaurant_table.restaurant_id)
+        assert reservation_crud.book_reservation(booking_request(restaurant_table.id), restaurant, db)
+        assert reservation_crud.book_reservation(booking_request(restaurant_table.id), restaurant, db) is None
+        assert reservation_crud.book_reservation(booking_request(restaurant_table.id, hour=23), restaurant, db) \
+               is None
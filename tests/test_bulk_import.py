@@ -0,0 +1,66 @@
+import json
+from datetime import date
+
+from reservation.availability import load_table_day
+from reservation.models import Reservation
+from restaurant_management.models import Table
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+def reservation_row(table_id, hour=12, minute=0, customers=2):
+    return {
+        "main_guest_name": "Guest",
+        "number_of_customers": customers,
+        "table_id": table_id,
+        "start_time": f"2030-01-15T{hour:02}:{minute:02}:00+00:00",
+        "end_time": f"2030-01-15T{hour:02}:{minute + 15:02}:00+00:00",
+    }
+
+
+class TestBulkImport:
+
+    def test_tables_from_json_array(self, client, db, restaurant_table):
+        restaurant_id = restaurant_table.restaurant_id
+        response = client.post("/v1/restaurants/tables/bulk", json=[
+            {"restaurant_id": restaurant_id, "number_of_seats": 2, "number": 10},
+            {"restaurant_id": restaurant_id, "number_of_seats": 2, "number": 10},
+            {"restaurant_id": restaurant_id, "number_of_seats": 6, "number": 1},
+            {"restaurant_id": restaurant_id + 1, "number_of_seats": 2, "number": 11},
+            {"restaurant_id": restaurant_id, "number_of_seats": 0, "number": 12},
+            {"restaurant_id": restaurant_id, "number_of_seats": 8, "number": 13},
+        ])
+        assert response.status_code == 200
+        result = response.json()
+        assert (result["received"], result["inserted"]) == (6, 2)
+        assert [error["row"] for error in result["errors"]] == [1, 2, 3, 4]
+        assert sorted(number for number, in db.query(Table.number)) == [1, 10, 13]
+
+    def test_reservations_from_ndjson(self, client, db, restaurant_table, monkeypatch):
+        monkeypatch.setattr("reservation.api.v1.settings.BULK_IMPORT_CHUNK_SIZE", 2)
+        rows = [
+            reservation_row(restaurant_table.id, 12, 0),
+            reservation_row(restaurant_table.id, 12, 15),
+            reservation_row(restaurant_table.id, 12, 0),
+            reservation_row(restaurant_table.id, 23, 0),
+            reservation_row(restaurant_table.id, 13, 0, customers=5),
+            reservation_row(restaurant_table.id + 1, 13, 0),
+        ]
+        body = "\n".join(json.dumps(row) for row in rows) + "\n{not json\n"
+        response = client.post("/v1/reservations/bulk", data=body, headers=NDJSON)
+        assert response.status_code == 200
+        result = response.json()
+        assert (result["received"], result["inserted"]) == (7, 2)
+        assert {error["row"]: error["detail"] for error in result["errors"]} == {
+            2: "Time slot is not available.",
+            3: "Time slot is not available.",
+            4: "Table seats are not enough.",
+            5: f"Table {restaurant_table.id + 1} does not exist.",
+            6: result["errors"][-1]["detail"],
+        }
+        assert db.query(Reservation).count() == 2
+        # Both chunks' reservations are in the occupancy row of the day
+        assert load_table_day(restaurant_table.id, date(2030, 1, 15), db) == (1 << 48) | (1 << 49)
+
+    def test_rejects_non_array_body(self, client):
+        assert client.post("/v1/reservations/bulk", json={"rows": []}).status_code == 400
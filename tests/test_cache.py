@@ -0,0 +1,31 @@
+import time
+
+from app.core.cache import TTLCache
+
+
+class TestTTLCache:
+
+    def test_counts_hits_and_misses(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        assert cache.get("token") is None
+        cache.set("token", "user")
+        assert cache.get("token") == "user"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("short", 1, ttl=0.01)
+        cache.set("expired", 1, ttl=-5)
+        time.sleep(0.02)
+        assert cache.get("short") is None
+        assert cache.get("expired") is None
+        assert len(cache) == 0
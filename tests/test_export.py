@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from reservation.models import Reservation
+
+START = datetime(2030, 1, 15, 10, 0)
+
+
+@pytest.fixture
+def reservations(db, restaurant_table):
+    db.add_all([Reservation(main_guest_name=f"Guest {index}", number_of_customers=2, table_id=restaurant_table.id,
+                            start_time=START + timedelta(minutes=15 * index),
+                            end_time=START + timedelta(minutes=15 * (index + 1)))
+                for index in range(25)])
+    db.commit()
+    return restaurant_table
+
+
+class TestExport:
+
+    def test_ndjson_streams_from_server_side_cursor(self, client, async_engine, reservations, monkeypatch):
+        monkeypatch.setattr("reservation.api.v1.settings.EXPORT_BATCH_SIZE", 10)
+        streamed = []
+        event.listen(async_engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, params, context, many:
+                     streamed.append(context.execution_options.get("stream_results")))
+        response = client.get(f"/v1/reservations{reservations.restaurant_id}/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["main_guest_name"] for row in rows] == [f"Guest {index}" for index in range(25)]
+        assert rows[0]["start_time"] == START.isoformat()
+        assert streamed == [True]
+
+    def test_csv_with_gzip(self, client, reservations):
+        response = client.get(f"/v1/reservations{reservations.restaurant_id}/export",
+                              params={"format": "csv", "gzip": True, "start": "2030-01-15T00:00:00",
+                                      "end": "2030-01-16T00:00:00"})
+        # The client decompresses the body transparently
+        assert response.headers["content-encoding"] == "gzip"
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 25 and rows[-1]["main_guest_name"] == "Guest 24"
+
+    def test_empty_csv_has_header(self, client, restaurant_table):
+        response = client.get(f"/v1/reservations{restaurant_table.restaurant_id}/export", params={"format": "csv"})
+        assert response.text.splitlines() == ["id,table_id,main_guest_name,number_of_customers,start_time,end_time"]
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from users import auth_service
+from users.hashing import PasswordHasher, password_hasher
+
+
+class TestPasswordHasher:
+
+    @pytest.mark.parametrize("kind", ["thread", "process"])
+    def test_hashes_and_verifies_on_executor(self, kind):
+        hasher = PasswordHasher(kind, workers=1, max_pending=4)
+
+        async def round_trip():
+            new_password = await hasher.run(auth_service.create_salt_and_hashed_password,
+                                            plaintext_password="secret-password")
+            return await hasher.run(auth_service.verify_password, password="secret-password",
+                                    salt=new_password.salt, hashed_pw=new_password.password)
+
+        try:
+            assert asyncio.run(round_trip())
+        finally:
+            hasher.shutdown()
+        assert hasher.pending == 0
+
+    def test_rejects_when_saturated(self):
+        hasher = PasswordHasher("thread", workers=1, max_pending=1)
+
+        async def burst():
+            return await asyncio.gather(*(hasher.run(auth_service.hash_password, password="password", salt="salt")
+                                          for _ in range(3)), return_exceptions=True)
+
+        try:
+            results = asyncio.run(burst())
+        finally:
+            hasher.shutdown()
+        rejected = [result for result in results if isinstance(result, HTTPException)]
+        assert len(rejected) == 2 and rejected[0].status_code == 429
+
+    def test_login_returns_429_when_saturated(self, client, monkeypatch):
+        assert client.post("/v1/users/", json={"e_number": 1234, "password": "secret-password"}).status_code == 201
+        monkeypatch.setattr(password_hasher, "max_pending", 0)
+        response = client.post("/v1/users/login", json={"e_number": 1234, "password": "secret-password"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
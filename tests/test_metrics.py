@@ -0,0 +1,82 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+from app.core.metrics import TimedNullPool, TimedQueuePool, instrument_engine
+from app.core.pool import engine_options, ping_idle_connections, pool_status
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics:
+
+    def test_route_latency_queries_and_cache(self, client, async_engine, restaurant_table):
+        instrument_engine(async_engine.sync_engine)
+        route = "/v1/reservations{restaurant_id}/tables/{table_id}"
+        labels = {"method": "POST", "route": route}
+        before = (sample("http_request_duration_seconds_count", status="200", **labels),
+                  sample("db_queries_per_request_sum", **labels),
+                  sample("cache_lookups_total", cache="availability", result="hit"))
+
+        path = f"/v1/reservations{restaurant_table.restaurant_id}/tables/{restaurant_table.id}"
+        for _ in range(2):
+            assert client.post(path, json={"date": "2030-01-15T00:00:00"}).status_code == 200
+
+        assert sample("http_request_duration_seconds_count", status="200", **labels) == before[0] + 2
+        # Table with its restaurant and the table-day reservations on the first request, the second one is
+        # served from the metadata registry and the cache
+        assert sample("db_queries_per_request_sum", **labels) - before[1] == 2
+        assert sample("cache_lookups_total", cache="availability", result="hit") == before[2] + 1
+        assert sample("http_requests_in_flight", **labels) == 0
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert f'http_request_duration_seconds_bucket{{le="0.005",method="POST",route="{route}",status="200"}}' \
+               in response.text
+
+    def test_pool_checkout_wait(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool)
+        before = sample("db_pool_checkout_seconds_count", pool="sync")
+        with engine.connect() as connection:
+            connection.execute(text("select 1"))
+        assert sample("db_pool_checkout_seconds_count", pool="sync") == before + 1
+
+
+class TestPools:
+
+    def test_overflow_and_timeouts(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1,
+                               max_overflow=1, pool_timeout=0.01)
+        with engine.connect(), engine.connect():
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+        status = pool_status(engine)
+        assert (status["checkouts"], status["overflow_checkouts"], status["max_overflow_used"], status["timeouts"]) \
+               == (2, 1, 1, 1)
+        assert status["checked_in"] == 1
+
+    def test_idle_connections_are_pinged(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool)
+        ping_idle_connections(engine, idle=0)
+        with engine.connect() as connection:
+            dbapi_connection = connection.connection.dbapi_connection
+        # Dropped behind the pool's back, like a connection closed by the server
+        dbapi_connection.close()
+        with engine.connect() as connection:
+            assert connection.execute(text("select 1")).scalar() == 1
+            assert connection.connection.dbapi_connection is not dbapi_connection
+
+    def test_pgbouncer_mode(self):
+        config = settings.copy(update={"DATABASE_PGBOUNCER": True})
+        assert engine_options(is_async=False, config=config) == {"poolclass": TimedNullPool}
+        options = engine_options(is_async=True, config=config)
+        assert options["connect_args"] == {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+
+    def test_pools_endpoint(self, client):
+        response = client.get("/pools")
+        assert response.status_code == 200
+        assert set(response.json()["pools"]) >= {"sync", "async"}
@@ -0,0 +1,113 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import event
+
+import reservation.availability as availability
+import reservation.crud as reservation_crud
+from reservation.availability import load_table_day, refresh_occupancy, span_mask
+from reservation.models import Reservation, TableDayOccupancy
+from reservation.occupancy import build_occupancy_matrix, free_slots_matrix
+from reservation.rebuild_occupancy import rebuild_occupancy
+from reservation.schemas import CreateReservationSchema
+from restaurant_management.models import Table
+
+
+def add_reservation(db, table, start, end):
+    db.add(Reservation(main_guest_name="Guest", number_of_customers=2, table_id=table.id, start_time=start,
+                       end_time=end))
+    db.flush()
+    refresh_occupancy({(table.id, start.date())}, db)
+    db.commit()
+
+
+class TestOccupancyMatrix:
+
+    def test_marks_reserved_slots(self, db, restaurant_table):
+        add_reservation(db, restaurant_table, datetime(2030, 1, 16, 12, 0), datetime(2030, 1, 16, 12, 15))
+        add_reservation(db, restaurant_table, datetime(2030, 1, 16, 23, 45), datetime(2030, 1, 17, 0, 0))
+        occupancy = build_occupancy_matrix([restaurant_table.id], date(2030, 1, 15), 2, db)
+        assert occupancy.shape == (2, 1, 96)
+        assert not occupancy[0].any()
+        assert occupancy[1, 0].nonzero()[0].tolist() == [48, 95]
+
+    def test_free_slots_within_opening_hours(self, db, restaurant_table):
+        add_reservation(db, restaurant_table, datetime(2030, 1, 15, 10, 0), datetime(2030, 1, 15, 10, 30))
+        occupancy = build_occupancy_matrix([restaurant_table.id], date(2030, 1, 15), 1, db)
+        free_slots = free_slots_matrix(occupancy, 10, 22)
+        assert free_slots[0, 0].nonzero()[0].tolist() == list(range(42, 88))
+
+
+class TestOccupancyRows:
+
+    def test_maintained_by_reservation_writes(self, db, restaurant_table):
+        created = [reservation_crud.create_reservation(CreateReservationSchema(
+            main_guest_name="Guest", number_of_customers=2, table_id=restaurant_table.id,
+            start_time=datetime(2030, 1, 15, 12, minute, tzinfo=timezone.utc),
+            end_time=datetime(2030, 1, 15, 12, minute + 15, tzinfo=timezone.utc)), db) for minute in (0, 30)]
+        assert load_table_day(restaurant_table.id, date(2030, 1, 15), db) == (1 << 48) | (1 << 50)
+
+        reservation_crud.delete_reservation_by_id(created[0].id, db)
+        assert load_table_day(restaurant_table.id, date(2030, 1, 15), db) == 1 << 50
+        reservation_crud.delete_reservation_by_id(created[1].id, db)
+        assert db.query(TableDayOccupancy).count() == 0
+
+    def test_writers_lock_the_table_day_before_inserting(self, db, restaurant_table, monkeypatch):
+        events = []
+
+        def lock_table_day(table_id, day, session):
+            events.append(("lock", table_id, day))
+
+        def record_insert(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO reservations"):
+                events.append(("insert",))
+
+        monkeypatch.setattr(availability, "lock_table_day", lock_table_day)
+        monkeypatch.setattr(reservation_crud, "lock_table_day", lock_table_day)
+        event.listen(db.get_bind(), "before_cursor_execute", record_insert)
+        request = CreateReservationSchema(
+            main_guest_name="Guest", number_of_customers=2, table_id=restaurant_table.id,
+            start_time=datetime(2030, 1, 15, 12, 0, tzinfo=timezone.utc),
+            end_time=datetime(2030, 1, 15, 12, 15, tzinfo=timezone.utc))
+        reservation_crud.create_reservation(request, db)
+        reservation_crud.bulk_create_reservations(
+            [(0, request.copy(update={"start_time": datetime(2030, 1, 16, 12, 0, tzinfo=timezone.utc),
+                                      "end_time": datetime(2030, 1, 16, 12, 15, tzinfo=timezone.utc)}))],
+            db, chunk_size=10)
+        event.remove(db.get_bind(), "before_cursor_execute", record_insert)
+        assert events == [("lock", restaurant_table.id, date(2030, 1, 15)), ("insert",),
+                          ("lock", restaurant_table.id, date(2030, 1, 16)), ("insert",)]
+
+    def test_rebuild_repairs_missing_and_stale_rows(self, db, restaurant_table):
+        db.add(Reservation(main_guest_name="Guest", number_of_customers=2, table_id=restaurant_table.id,
+                           start_time=datetime(2030, 1, 15, 12, 0), end_time=datetime(2030, 1, 15, 12, 15)))
+        db.add(TableDayOccupancy(table_id=restaurant_table.id, day=date(2030, 1, 16), slots=b"\xff" * 12))
+        db.commit()
+
+        assert rebuild_occupancy(db, batch_size=1) == 2
+        assert load_table_day(restaurant_table.id, date(2030, 1, 15), db) == \
+               span_mask(datetime(2030, 1, 15, 12, 0), datetime(2030, 1, 15, 12, 15))
+        assert load_table_day(restaurant_table.id, date(2030, 1, 16), db) == 0
+
+
+class TestRestaurantAvailabilityApi:
+
+    def test_returns_every_table_filtered_by_party_size(self, db, client, restaurant_table):
+        db.add(Table(restaurant_id=restaurant_table.restaurant_id, number_of_seats=2, number=2))
+        db.commit()
+        add_reservation(db, restaurant_table, datetime(2030, 1, 16, 21, 45), datetime(2030, 1, 16, 22, 0))
+
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/availability",
+                               json={"start_date": "2030-01-15", "end_date": "2030-01-16"})
+        assert response.status_code == 200
+        days = response.json()
+        assert [day["date"] for day in days] == ["2030-01-15", "2030-01-16"]
+        assert [len(table["slots"]) for table in days[1]["tables"]] == [48, 47]
+
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/availability",
+                               json={"start_date": "2030-01-15", "party_size": 3})
+        assert [table["table_id"] for table in response.json()[0]["tables"]] == [restaurant_table.id]
+
+    def test_rejects_long_date_range(self, client, restaurant_table):
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/availability",
+                               json={"start_date": "2030-01-01", "end_date": "2030-03-01"})
+        assert response.status_code == 422
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from app.pagination import decode_cursor, encode_cursor
+from reservation.models import Reservation
+from restaurant_management.models import Table
+
+
+def seed_reservations(db, table, count):
+    other_table = Table(restaurant_id=table.restaurant_id, number_of_seats=4, number=2)
+    db.add(other_table)
+    db.flush()
+    start = datetime(2030, 1, 15, 10)
+    for index in range(count):
+        # Two reservations per start time so pages have to break ties on id
+        slot_start = start + timedelta(minutes=15 * (index // 2))
+        db.add(Reservation(main_guest_name=f"Guest {index}", number_of_customers=2,
+                           table_id=(table, other_table)[index % 2].id,
+                           start_time=slot_start, end_time=slot_start + timedelta(minutes=15)))
+    db.commit()
+
+
+def fetch_all(client, url, **params):
+    items, cursor, pages = [], None, 0
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json()
+        items.extend(page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            return items, pages
+
+
+class TestKeysetPagination:
+
+    def test_cursor_round_trip(self):
+        values = [datetime(2030, 1, 15, 10, 30), 42]
+        assert decode_cursor(encode_cursor(values), [Reservation.start_time, Reservation.id]) == values
+
+    def test_pages_cover_every_reservation_once(self, db, client, restaurant_table):
+        seed_reservations(db, restaurant_table, 25)
+        url = f"/v1/reservations{restaurant_table.restaurant_id}/"
+
+        items, pages = fetch_all(client, url, size=10)
+        assert pages == 3
+        assert len({item["id"] for item in items}) == 25
+        assert [(item["start_time"], item["id"]) for item in items] == \
+               sorted((item["start_time"], item["id"]) for item in items)
+
+        descending, _ = fetch_all(client, url, size=10, order="desc")
+        assert [item["id"] for item in descending] == [item["id"] for item in reversed(items)]
+
+    def test_filters_apply_to_every_page(self, db, client, restaurant_table):
+        seed_reservations(db, restaurant_table, 10)
+        items, _ = fetch_all(client, f"/v1/reservations{restaurant_table.restaurant_id}/", size=3,
+                             start="2030-01-16T00:00:00")
+        assert items == []
+
+    def test_estimate_is_optional(self, db, client, restaurant_table):
+        seed_reservations(db, restaurant_table, 3)
+        response = client.get(f"/v1/reservations{restaurant_table.restaurant_id}/", params={"estimate": True})
+        assert response.json()["next_cursor"] is None
+        assert "estimated_total" in response.json()
+
+    def test_invalid_cursor(self, client, restaurant_table):
+        response = client.get(f"/v1/reservations{restaurant_table.restaurant_id}/", params={"cursor": "nope"})
+        assert response.status_code == 400
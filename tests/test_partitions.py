@@ -0,0 +1,120 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import reservation.crud as reservation_crud
+from app.core.config import settings
+from app.database import Base
+from app.startup import ALEMBIC_INI
+from reservation.partitions import add_months, archive_partitions, create_partitions, list_partitions
+from restaurant_management.models import Restaurant, Table
+from tests.conftest import TEST_DATABASE_URI
+
+postgres = pytest.mark.skipif(not (TEST_DATABASE_URI or "").startswith("postgresql"),
+                              reason="Partitions need TEST_DATABASE_URI to point to Postgres")
+
+
+@pytest.fixture
+def partitioned_db(db, engine, database_uri, monkeypatch):
+    """``db`` on a schema built by the migrations, ``create_all`` doesn't partition ``reservations``."""
+    from alembic import command
+    from alembic.config import Config
+
+    Base.metadata.drop_all(bind=engine)
+    monkeypatch.setattr(settings, "DATABASE_URI", database_uri)
+    # Without the ini file, its logging configuration would disable the loggers of the app
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    command.upgrade(config, "head")
+    yield db
+    db.rollback()
+    db.execute(text(f'DROP SCHEMA IF EXISTS "{settings.RESERVATION_ARCHIVE_SCHEMA}" CASCADE'))
+    db.execute(text("DROP TABLE alembic_version"))
+    db.execute(text("DROP FUNCTION create_reservation_partition(date)"))
+    db.commit()
+
+
+@pytest.fixture
+def table(partitioned_db):
+    restaurant = Restaurant(name="Test restaurant", open_hour=10, close_hour=22)
+    partitioned_db.add(restaurant)
+    partitioned_db.flush()
+    table = Table(restaurant_id=restaurant.id, number_of_seats=4, number=1)
+    partitioned_db.add(table)
+    partitioned_db.commit()
+    return table
+
+
+def book(db, table, start):
+    db.execute(text("INSERT INTO reservations (main_guest_name, number_of_customers, table_id, start_time, end_time) "
+                    "VALUES ('Guest', 2, :table_id, :start, :end)"),
+               {"table_id": table.id, "start": start, "end": start + timedelta(minutes=15)})
+    db.commit()
+
+
+def partition_of(db, start):
+    return db.execute(text("SELECT tableoid::regclass::text FROM reservations WHERE start_time = :start"),
+                      {"start": start}).scalar()
+
+
+class TestPartitions:
+
+    def test_add_months_across_years(self):
+        assert add_months(date(2030, 11, 1), 3) == date(2031, 2, 1)
+        assert add_months(date(2030, 1, 1), -1) == date(2029, 12, 1)
+
+    def test_nothing_to_do_without_partitions(self, db):
+        assert create_partitions(db, 3) == []
+        assert archive_partitions(db, 24, "archive") == []
+
+
+@postgres
+class TestPostgresPartitions:
+
+    def test_migration_creates_the_months_ahead(self, partitioned_db):
+        this_month = date.today().replace(day=1)
+        months = set(list_partitions(partitioned_db).values())
+        assert {add_months(this_month, ahead) for ahead in range(settings.RESERVATION_PARTITIONS_AHEAD + 1)} <= months
+
+    def test_rows_are_routed_to_their_month(self, partitioned_db, table):
+        this_month = date.today().replace(day=1)
+        start = datetime.combine(this_month, datetime.min.time()).replace(hour=12)
+        book(partitioned_db, table, start)
+        assert partition_of(partitioned_db, start) == f"reservations_y{this_month.year}m{this_month.month:02}"
+
+        # Beyond the created months rows land in the default partition until the job creates theirs
+        later = add_months(this_month, settings.RESERVATION_PARTITIONS_AHEAD + 2)
+        later_start = datetime.combine(later, datetime.min.time()).replace(hour=12)
+        book(partitioned_db, table, later_start)
+        assert partition_of(partitioned_db, later_start) == "reservations_default"
+        name = f"reservations_y{later.year}m{later.month:02}"
+        assert name in create_partitions(partitioned_db, settings.RESERVATION_PARTITIONS_AHEAD + 2)
+        assert partition_of(partitioned_db, later_start) == name
+        assert create_partitions(partitioned_db, settings.RESERVATION_PARTITIONS_AHEAD + 2) == []
+
+    def test_queries_scan_only_the_partitions_of_their_range(self, partitioned_db, table):
+        this_month = date.today().replace(day=1)
+        day = datetime.combine(this_month, datetime.min.time())
+        statement = reservation_crud.reservations_by_restaurant_query(
+            table.restaurant_id, partitioned_db, day, day + timedelta(days=1)).statement
+        connection = partitioned_db.connection()
+        compiled = statement.compile(dialect=connection.dialect)
+        plan = "\n".join(connection.exec_driver_sql("EXPLAIN " + compiled.string, compiled.params).scalars())
+        scanned = {name for name in list_partitions(partitioned_db) if name in plan}
+        assert scanned == {f"reservations_y{this_month.year}m{this_month.month:02}"}
+        assert "reservations_default" not in plan
+
+    def test_old_partitions_are_archived(self, partitioned_db, table):
+        schema = settings.RESERVATION_ARCHIVE_SCHEMA
+        old = add_months(date.today().replace(day=1), -30)
+        partitioned_db.execute(text("SELECT create_reservation_partition(:month)"), {"month": old})
+        old_start = datetime.combine(old, datetime.min.time()).replace(hour=12)
+        book(partitioned_db, table, old_start)
+        name = f"reservations_y{old.year}m{old.month:02}"
+
+        assert archive_partitions(partitioned_db, 24, schema) == [name]
+        assert name not in list_partitions(partitioned_db)
+        assert partition_of(partitioned_db, old_start) is None
+        assert partitioned_db.execute(text(f'SELECT count(*) FROM "{schema}"."{name}"')).scalar() == 1
+        assert archive_partitions(partitioned_db, 24, schema) == []
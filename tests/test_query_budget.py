@@ -0,0 +1,77 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from app.core.metrics import instrument_engine
+from app.core.queries import QueryStats, assert_max_queries, count_queries
+
+
+def slots_path(table):
+    return f"/v1/reservations{table.restaurant_id}/tables/{table.id}"
+
+
+class TestQueryStats:
+
+    def test_flags_budget_repeats_and_n_plus_one(self):
+        stats = QueryStats()
+        stats.record("SELECT * FROM tables WHERE id = ?", (1,), 0.001)
+        stats.record("SELECT * FROM tables WHERE id = ?", (1,), 0.001)
+        for table_id in range(2, 8):
+            stats.record("SELECT * FROM restaurants WHERE id = ?", (table_id,), 0.001)
+        assert stats.repeated() == ["SELECT * FROM tables WHERE id = ?"]
+        problems = stats.problems(budget=5, repeat_limit=5)
+        assert problems[0] == "8 statements over the budget of 5"
+        assert problems[1].startswith("identical statement repeated")
+        assert problems[2].startswith("statement ran 6 times, likely N+1")
+
+    def test_assert_max_queries_fails_over_budget(self, engine):
+        with pytest.raises(AssertionError, match="2 statements ran, the budget is 1"):
+            with assert_max_queries(1, engine):
+                with engine.connect() as connection:
+                    connection.execute(text("select 1"))
+                    connection.execute(text("select 2"))
+
+
+class TestEndpointBudgets:
+
+    def test_slot_calculator(self, client, async_engine, restaurant_table):
+        # Table with its restaurant, then the table-day reservations on a cache miss
+        with assert_max_queries(2, async_engine.sync_engine):
+            client.post(slots_path(restaurant_table), json={"date": "2030-01-15T00:00:00"})
+        with assert_max_queries(0, async_engine.sync_engine):
+            client.post(slots_path(restaurant_table), json={"date": "2030-01-15T00:00:00"})
+
+    def test_create_reservation(self, client, async_engine, restaurant_table):
+        # The registry load of the table with its restaurant and tables, then the table-day occupancy, the insert
+        # and the occupancy upsert. Postgres also takes the table-day advisory lock.
+        lock = async_engine.dialect.name == "postgresql"
+        with assert_max_queries(4 + lock, async_engine.sync_engine):
+            response = client.post("/v1/reservations/", json={
+                "main_guest_name": "Guest",
+                "number_of_customers": 4,
+                "table_id": restaurant_table.id,
+                "start_time": "2030-01-15T12:00:00+00:00",
+                "end_time": "2030-01-15T12:15:00+00:00",
+            })
+        assert response.status_code == 201
+
+    def test_listings(self, client, async_engine, restaurant_table):
+        with assert_max_queries(1, async_engine.sync_engine):
+            client.get(f"/v1/reservations{restaurant_table.restaurant_id}/")
+        with assert_max_queries(1, async_engine.sync_engine):
+            client.get(f"/v1/restaurants{restaurant_table.restaurant_id}/tables")
+
+    def test_requests_over_budget_are_logged(self, client, async_engine, restaurant_table, monkeypatch, caplog):
+        instrument_engine(async_engine.sync_engine)
+        monkeypatch.setattr("app.core.metrics.settings.QUERY_BUDGET", 0)
+        with caplog.at_level(logging.WARNING, logger="app.core.metrics"):
+            client.get(f"/v1/restaurants{restaurant_table.restaurant_id}/tables")
+        assert "GET /v1/restaurants{restaurant_id}/tables: 1 statements over the budget of 0" in caplog.text
+
+    def test_context_counting(self, engine):
+        instrument_engine(engine)
+        with count_queries() as stats:
+            with engine.connect() as connection:
+                connection.execute(text("select 1"))
+        assert stats.count == 1
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from reservation.availability import load_table_day
+from reservation.crud import get_reservations_by_restaurant_id, get_reservations_page
+from reservation.occupancy import build_occupancy_matrix
+
+FULL_SCAN_MARKERS = {
+    "sqlite": "SCAN reservations",
+    "postgresql": "Seq Scan on reservations",
+}
+
+
+@pytest.fixture
+def query_plans(db):
+    """Collects the plans of the statements executed by ``db``."""
+    connection = db.connection()
+    dialect = connection.dialect.name
+    plans = []
+
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        return prefix + statement, parameters
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        plans.append("\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall()))
+        # Run the statement itself so the caller gets its real results
+        cursor.execute(statement[len(prefix):], parameters)
+
+    if dialect == "postgresql":
+        # Tiny test tables are always cheaper to scan; check that an index can be used
+        connection.exec_driver_sql("SET enable_seqscan = off")
+    event.listen(connection, "before_cursor_execute", explain, retval=True)
+    event.listen(connection, "after_cursor_execute", collect)
+    yield plans
+    event.remove(connection, "before_cursor_execute", explain)
+    event.remove(connection, "after_cursor_execute", collect)
+
+
+def assert_no_full_scan(db, plans):
+    marker = FULL_SCAN_MARKERS[db.bind.dialect.name]
+    assert plans
+    for plan in plans:
+        assert marker not in plan, plan
+
+
+class TestReservationQueryPlans:
+
+    def test_restaurant_reservations_by_date_range(self, db, restaurant_table, query_plans):
+        get_reservations_by_restaurant_id(restaurant_table.restaurant_id, db, datetime(2030, 1, 15),
+                                          datetime(2030, 1, 16))
+        assert_no_full_scan(db, query_plans)
+
+    def test_restaurant_reservations_page(self, db, restaurant_table, query_plans):
+        get_reservations_page(restaurant_table.restaurant_id, db, datetime(2030, 1, 15), datetime(2030, 1, 16),
+                              cursor="WyIyMDMwLTAxLTE1VDEwOjAwOjAwIiwgMV0=", size=10)
+        assert_no_full_scan(db, query_plans)
+
+    def test_table_day_availability(self, db, restaurant_table, query_plans):
+        load_table_day(restaurant_table.id, datetime(2030, 1, 15).date(), db)
+        assert_no_full_scan(db, query_plans)
+
+    def test_restaurant_occupancy(self, db, restaurant_table, query_plans):
+        build_occupancy_matrix([restaurant_table.id], datetime(2030, 1, 15).date(), 7, db)
+        assert_no_full_scan(db, query_plans)
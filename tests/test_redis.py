@@ -0,0 +1,26 @@
+import asyncio
+
+from redis.asyncio import Redis
+
+from app.core.redis import cache_key, get_json, get_json_many, set_json_many
+
+
+class TestRedisHelpers:
+
+    def test_batched_round_trip(self, redis):
+        async def round_trip():
+            await set_json_many(redis, {"user:1": {"e_number": 1000}, "user:2": [1, 2]}, ttl=60)
+            return await get_json_many(redis, ["user:1", "missing", "user:2"]), await redis.ttl(cache_key("user:1"))
+
+        values, ttl = asyncio.run(round_trip())
+        assert values == [{"e_number": 1000}, None, [1, 2]]
+        assert 0 < ttl <= 60
+
+    def test_unreachable_redis_is_a_miss(self):
+        redis = Redis.from_url("redis://127.0.0.1:1", socket_connect_timeout=0.1)
+
+        async def lookup():
+            await set_json_many(redis, {"key": 1}, ttl=60)
+            return await get_json(redis, "key")
+
+        assert asyncio.run(lookup()) is None
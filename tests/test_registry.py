@@ -0,0 +1,47 @@
+from app.core.queries import count_queries
+import restaurant_management.crud as restaurant_crud
+from restaurant_management.registry import MetadataRegistry, metadata_registry
+from restaurant_management.schemas import CreateTableSchema, RestaurantDetailsSchema
+
+
+class TestMetadataRegistry:
+
+    def test_table_with_restaurant_loads_once(self, db, engine, restaurant_table):
+        table_id = restaurant_table.id
+        with count_queries(engine) as stats:
+            table, restaurant = metadata_registry.table_with_restaurant(table_id, db)
+            assert metadata_registry.restaurant(restaurant.id, db) == restaurant
+            assert metadata_registry.tables(restaurant.id, db) == [table]
+        assert stats.count == 1
+        assert (table.number_of_seats, restaurant.open_hour, restaurant.close_hour) == (4, 10, 22)
+
+    def test_unknown_ids(self, db, restaurant_table):
+        assert metadata_registry.table_with_restaurant(restaurant_table.id + 1, db) is None
+        assert metadata_registry.restaurant(restaurant_table.restaurant_id + 1, db) is None
+        assert metadata_registry.tables(restaurant_table.restaurant_id + 1, db) == []
+
+    def test_writes_invalidate(self, db, restaurant_table):
+        restaurant_id = restaurant_table.restaurant_id
+        assert metadata_registry.restaurant(restaurant_id, db).close_hour == 22
+        restaurant_crud.update_restaurant(RestaurantDetailsSchema(
+            id=restaurant_id, name="Test restaurant", open_hour=10, close_hour=23), db)
+        assert metadata_registry.restaurant(restaurant_id, db).close_hour == 23
+
+        table = restaurant_crud.create_table(
+            CreateTableSchema(restaurant_id=restaurant_id, number_of_seats=2, number=2), db)
+        assert [entry.id for entry in metadata_registry.tables(restaurant_id, db)] == [table.id, restaurant_table.id]
+        restaurant_crud.delete_table_by_id(table.id, db)
+        assert metadata_registry.table(table.id, db) is None
+        assert metadata_registry.tables(restaurant_id, db, min_seats=3)[0].id == restaurant_table.id
+
+    def test_load_racing_an_invalidation_is_not_stored(self, db, restaurant_table, monkeypatch):
+        registry = MetadataRegistry(ttl=60)
+        load = db.query
+
+        def query_then_invalidate(*entities):
+            registry.invalidate(restaurant_table.restaurant_id)
+            return load(*entities)
+
+        monkeypatch.setattr(db, "query", query_then_invalidate)
+        assert registry.restaurant(restaurant_table.restaurant_id, db) is not None
+        assert not registry._restaurants
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.database import Base, replicas
+from restaurant_management.models import Restaurant
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """A second SQLite database standing in for a replica that hasn't caught up with the primary."""
+    uri = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(uri)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Restaurant(name="Replica restaurant", open_hour=10, close_hour=22))
+    session.commit()
+    session.close()
+    async_engine = create_async_engine(uri.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    monkeypatch.setattr(replicas, "sessionmakers", [sessionmaker(bind=async_engine, class_=AsyncSession,
+                                                                 expire_on_commit=False)])
+    yield
+    engine.dispose()
+
+
+def restaurant_names(client):
+    return [restaurant["name"] for restaurant in client.get("/v1/restaurants/").json()]
+
+
+class TestReplicaRouting:
+
+    def test_replica_safe_routes_read_the_replica(self, client, restaurant_table, replica):
+        assert restaurant_names(client) == ["Replica restaurant"]
+        response = client.get(f"/v1/restaurants{restaurant_table.restaurant_id}/tables")
+        # The replica hasn't got the table yet
+        assert response.json() == []
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/availability",
+                               json={"start_date": "2030-01-15"})
+        assert settings.REPLICA_STICKY_COOKIE not in response.cookies
+
+    def test_reads_stick_to_the_primary_after_a_write(self, client, restaurant_table, replica):
+        response = client.post("/v1/restaurants/", json={"name": "New restaurant", "open_hour": 9, "close_hour": 21})
+        assert response.status_code == 201
+        assert settings.REPLICA_STICKY_COOKIE in response.cookies
+        assert restaurant_names(client) == ["Test restaurant", "New restaurant"]
+
+        client.cookies.clear()
+        assert restaurant_names(client) == ["Replica restaurant"]
+
+    def test_everything_reads_the_primary_without_replicas(self, client, restaurant_table):
+        response = client.post("/v1/restaurants/", json={"name": "New restaurant", "open_hour": 9, "close_hour": 21})
+        assert settings.REPLICA_STICKY_COOKIE not in response.cookies
+        assert restaurant_names(client) == ["Test restaurant", "New restaurant"]
+
+    def test_cached_calculations_read_the_primary(self, client, restaurant_table, replica):
+        response = client.post("/v1/reservations/", json={
+            "main_guest_name": "Guest", "number_of_customers": 4, "table_id": restaurant_table.id,
+            "start_time": "2030-01-15T12:00:00+00:00", "end_time": "2030-01-15T12:15:00+00:00"})
+        assert response.status_code == 201
+
+        # Another client, the replica has neither the table nor the booking and would fill the shared caches
+        client.cookies.clear()
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/tables/{restaurant_table.id}",
+                               json={"date": "2030-01-15T00:00:00"})
+        assert response.status_code == 200
+        assert "2030-01-15T12:00:00" not in [slot["start"] for slot in response.json()]
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/availability",
+                               json={"start_date": "2030-01-15"})
+        slots = [slot["start"] for slot in response.json()[0]["tables"][0]["slots"]]
+        assert "2030-01-15T11:45:00" in slots and "2030-01-15T12:00:00" not in slots
+        assert settings.REPLICA_STICKY_COOKIE not in response.cookies
+        response = client.post(f"/v1/reservations{restaurant_table.restaurant_id}/next-available",
+                               json={"party_size": 4, "start": "2030-01-15T12:00:00", "limit": 1})
+        assert [slot["start"] for slot in response.json()] == ["2030-01-15T12:15:00"]
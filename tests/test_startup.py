@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, text
+
+import app.startup as startup
+from app.core.config import settings
+
+
+class TestMigrate:
+
+    def test_skips_alembic_at_head(self, tmp_path, monkeypatch):
+        uri = f"sqlite:///{tmp_path / 'schema.db'}"
+        monkeypatch.setattr(settings, "DATABASE_URI", uri)
+        upgrades = []
+        monkeypatch.setattr("alembic.command.upgrade", lambda config, revision: upgrades.append(revision))
+
+        assert startup.migrate()
+        engine = create_engine(uri)
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+            for revision in startup.head_revisions():
+                connection.execute(text("INSERT INTO alembic_version VALUES (:revision)"), {"revision": revision})
+        engine.dispose()
+        assert not startup.migrate()
+        assert upgrades == ["head"]
+
+    def test_import_times(self):
+        modules = {name for name, _, _ in startup.import_times("app.core.config")}
+        assert {"pydantic", "app.core.config"} <= modules
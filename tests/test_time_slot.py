@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+
+from reservation.utils import TimeSlot, get_daily_slots, to_time_slots
+
+START = datetime(2030, 1, 15, 10, 0)
+
+
+def slot(start_minutes, end_minutes):
+    return TimeSlot(START + timedelta(minutes=start_minutes), START + timedelta(minutes=end_minutes))
+
+
+class TestTimeSlot:
+
+    def test_compact_representation(self):
+        time_slot = slot(0, 15)
+        assert not hasattr(time_slot, "__dict__")
+        assert (time_slot.start, time_slot.end, time_slot.duration) == (START, START + timedelta(minutes=15),
+                                                                         timedelta(minutes=15))
+        assert time_slot == TimeSlot.from_minutes(time_slot.start_minute, time_slot.end_minute)
+        assert len({slot(0, 15), slot(0, 15), slot(15, 30)}) == 2
+
+    def test_aware_datetimes_keep_their_wall_clock_time(self):
+        plus_two = timezone(timedelta(hours=2))
+        assert TimeSlot(datetime(2030, 1, 15, 12, tzinfo=plus_two), datetime(2030, 1, 15, 13, tzinfo=plus_two)) \
+               == TimeSlot(datetime(2030, 1, 15, 12), datetime(2030, 1, 15, 13))
+
+    def test_set_operations(self):
+        first, second, third = slot(0, 30), slot(15, 45), slot(60, 75)
+        assert first.overlaps(second) and not first.overlaps(third)
+        assert first.intersection(second) == slot(15, 30)
+        assert first.gap(third) == slot(30, 60)
+        assert first.union(second) == slot(0, 45)
+        assert START + timedelta(minutes=10) in first
+        assert sorted([third, first, second]) == [first, second, third]
+
+    def test_daily_slots(self):
+        slots = get_daily_slots(START, START.replace(hour=22), 15, START)
+        # Slots start every 15 minutes from the opening up to and including the closing time
+        assert len(slots) == 12 * 4 + 1
+        assert min(slots) == slot(0, 15)
+        assert set(to_time_slots(START.date(), range(40, 88))) < slots
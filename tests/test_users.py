@@ -1,8 +1,15 @@
+import asyncio
+
+import fakeredis
 import jose
 import pytest
+from fastapi import HTTPException
 from jose import jwt
 
+import users.authentication
 from app.core.config import settings
+from app.core.redis import set_json
+from users.authentication import token_cache
 
 
 @pytest.mark.usefixtures('auth_obj')
@@ -56,3 +63,41 @@ class TestAuthenticate:
 
         assert 'The specified alg value is not allowed' in str(jwt_error.value)
 
+
+@pytest.mark.usefixtures('dummy_user')
+class TestCurrentUserCache:
+
+    @pytest.fixture(autouse=True)
+    def redis_user(self, monkeypatch, dummy_user, redis_server):
+        lookups = []
+        get_json = users.authentication.get_json
+
+        async def counting_get_json(redis, key):
+            lookups.append(key)
+            return await get_json(redis, key)
+
+        monkeypatch.setattr(users.authentication, 'get_json', counting_get_json)
+        asyncio.run(set_json(fakeredis.FakeAsyncRedis(server=redis_server), str(dummy_user.e_number),
+                             dummy_user, 60))
+        token_cache.clear()
+        yield lookups
+        token_cache.clear()
+
+    def current_user(self, auth_obj, token, redis_server):
+        return asyncio.run(auth_obj.get_current_user(token=token, db=None,
+                                                     redis=fakeredis.FakeAsyncRedis(server=redis_server)))
+
+    def test_hot_token_skips_redis(self, auth_obj, dummy_user, redis_user, redis_server):
+        token = auth_obj.create_access_token_for_user(user=dummy_user)
+        first = self.current_user(auth_obj, token, redis_server)
+        second = self.current_user(auth_obj, token, redis_server)
+        assert first == second == dummy_user
+        assert redis_user == [str(dummy_user.e_number)]
+        assert token_cache.hits == 1
+
+    def test_invalid_token_is_not_cached(self, auth_obj, dummy_user, redis_server):
+        token = auth_obj.create_access_token_for_user(user=dummy_user, secret_key='nice-wrong-secret-key')
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                self.current_user(auth_obj, token, redis_server)
+        assert len(token_cache) == 0
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from app.dependencies import get_db
+from app.dependencies import get_async_db
+from app.utils import run_in_session
 from users import schemas, auth_service, get_current_active_user
+from users.hashing import password_hasher
 from users.crud import create_user, get_user_by_e_number
 from users.roles import ADMIN_ROLE
 from users.schemas import UserCreate, AccessToken
@@ -14,10 +16,12 @@ router = APIRouter(prefix="/v1/users",
 
 
 @router.post("/", response_model=schemas.UserPublic, status_code=status.HTTP_201_CREATED)
-def user_create(user: UserCreate, db: Session = Depends(get_db)):
-    if get_user_by_e_number(user.e_number, db):
+async def user_create(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await run_in_session(db, get_user_by_e_number, user.e_number):
         raise HTTPException(status_code=400, detail="Employee number already exists")
-    return create_user(user, db)
+    new_password = await password_hasher.run(auth_service.create_salt_and_hashed_password,
+                                             plaintext_password=user.password)
+    return await run_in_session(db, create_user, user, password=new_password)
 
 
 @router.post(
@@ -26,14 +30,15 @@ def user_create(user: UserCreate, db: Session = Depends(get_db)):
     description="Log in the User",
     response_model=schemas.UserPublic
 )
-def user_login(user: schemas.UserLogin, db: Session = Depends(get_db)) -> schemas.UserPublic:
-    found_user = get_user_by_e_number(e_number=user.e_number, db=db)
+async def user_login(user: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)) -> schemas.UserPublic:
+    found_user = await run_in_session(db, get_user_by_e_number, e_number=user.e_number)
     if not found_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Employee number or password not valid.",
         )
-    if auth_service.verify_password(password=user.password, salt=found_user.salt, hashed_pw=found_user.hashed_password):
+    if await password_hasher.run(auth_service.verify_password, password=user.password, salt=found_user.salt,
+                                 hashed_pw=found_user.hashed_password):
         # If the provided password is valid one then we are going to create an access token
         token = auth_service.create_access_token_for_user(user=found_user)
         access_token = AccessToken(access_token=token, token_type='bearer')
@@ -46,6 +51,6 @@ def user_login(user: schemas.UserLogin, db: Session = Depends(get_db)) -> schema
     description="Get current logged in user",
     response_model=schemas.UserPublic,
 )
-def get_me(db: Session = Depends(get_db),
-           current_user: schemas.UserSchema = Depends(get_current_active_user)) -> schemas.UserPublic:
+async def get_me(db: AsyncSession = Depends(get_async_db),
+                 current_user: schemas.UserSchema = Depends(get_current_active_user)) -> schemas.UserPublic:
     return current_user
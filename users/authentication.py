@@ -1,22 +1,34 @@
+import hashlib
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 
-import bcrypt
 from fastapi import HTTPException, Depends
-from fastapi_redis_cache import cache, FastApiRedisCache
-from fastapi_redis_cache.util import deserialize_json
 from jose import jwt
-from jsonschema import ValidationError
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.dependencies import oauth2_scheme, get_db
-from app.utils import get_from_cache, add_to_cache
+from app.core.metrics import record_cache
+from app.core.redis import get_json, set_json
+from app.dependencies import oauth2_scheme, get_async_db, get_redis
+from app.utils import run_in_session
 from .schemas import UserPasswordUpdate, JWTMeta, JWTCreds, JWTPayload, UserSchema, TokenData
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache()
+def pwd_context():
+    # passlib and bcrypt are imported on first use, most requests never hash a password
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Token digest -> (decoded claims, user), per worker
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL, name="token")
 
 
 class Authenticate():
@@ -27,15 +39,17 @@ class Authenticate():
 
     @staticmethod
     def generate_salt() -> str:
+        import bcrypt
+
         return bcrypt.gensalt().decode()
 
     @staticmethod
     def hash_password(*, password: str, salt: str) -> str:
-        return pwd_context.hash(password + salt)
+        return pwd_context().hash(password + salt)
 
     @staticmethod
     def verify_password(*, password: str, salt: str, hashed_pw: str) -> bool:
-        return pwd_context.verify(password + salt, hashed_pw)
+        return pwd_context().verify(password + salt, hashed_pw)
 
     @staticmethod
     def create_access_token_for_user(
@@ -62,9 +76,7 @@ class Authenticate():
         )
 
     @staticmethod
-    def get_e_number_from_token(*,
-                                token: str,
-                                secret_key: str = str(settings.SECRET_KEY)) -> Optional[str]:
+    def decode_token(*, token: str, secret_key: str = str(settings.SECRET_KEY)) -> JWTPayload:
         try:
             decoded_token = jwt.decode(token, str(secret_key),
                                        audience=settings.JWT_AUDIENCE,
@@ -76,42 +88,59 @@ class Authenticate():
                 detail="Could not validate token credentials.",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return payload.e_number
+        return payload
 
-    def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserSchema:
+    @staticmethod
+    def get_e_number_from_token(*,
+                                token: str,
+                                secret_key: str = str(settings.SECRET_KEY)) -> Optional[str]:
+        return Authenticate.decode_token(token=token, secret_key=secret_key).e_number
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme),
+                               db: AsyncSession = Depends(get_async_db),
+                               redis: Redis = Depends(get_redis)) -> UserSchema:
 
         from users.crud import get_user_by_e_number
 
+        # Hot tokens are served from this worker's memory without decoding, Redis or the database
+        token_key = hashlib.sha256(token.encode()).digest()
+        cached = token_cache.get(token_key)
+        if cached:
+            return cached[1]
+
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            e_number = self.get_e_number_from_token(token=token)
-            token_data = TokenData(e_number=e_number)
+            payload = self.decode_token(token=token)
+            token_data = TokenData(e_number=payload.e_number)
         except jwt.JWTError:
             raise credentials_exception
 
-        in_cache = get_from_cache(str(token_data.e_number))
+        in_cache = await get_json(redis, str(token_data.e_number))
+        record_cache("user", bool(in_cache))
         if not in_cache:
-            user = get_user_by_e_number(e_number=token_data.e_number, db=db)
-            add_to_cache(str(token_data.e_number), user.dict(), 3600)
+            user = await run_in_session(db, get_user_by_e_number, e_number=token_data.e_number)
+            if user:
+                await set_json(redis, str(token_data.e_number), user, 3600)
         else:
             user = UserSchema(**in_cache)
 
         if user is None:
             raise credentials_exception
+        token_cache.set(token_key, (payload, user), ttl=payload.exp - datetime.timestamp(datetime.now()))
         return user
 
 
-def get_current_active_user(current_user: UserSchema = Depends(Authenticate().get_current_user)) -> UserSchema:
+async def get_current_active_user(current_user: UserSchema = Depends(Authenticate().get_current_user)) -> UserSchema:
     if not current_user.is_active:
         raise HTTPException(status_code=401, detail="Inactive user")
     return current_user
 
 
-def check_if_user_is_admin(current_user: UserSchema = Depends(get_current_active_user)) -> UserSchema:
+async def check_if_user_is_admin(current_user: UserSchema = Depends(get_current_active_user)) -> UserSchema:
     if not current_user.is_admin:
         raise HTTPException(status_code=401, detail="You have not enough privileges")
     return current_user
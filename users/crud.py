@@ -2,12 +2,12 @@
 from sqlalchemy.orm import Session
 
 from users import auth_service, models
-from users.schemas import UserCreate, UserSchema
+from users.schemas import UserCreate, UserPasswordUpdate, UserSchema
 
 
-def create_user(new_user: UserCreate, db: Session) -> UserSchema:
-    # This is a UserPasswordUpdate
-    new_password = auth_service.create_salt_and_hashed_password(plaintext_password=new_user.password)
+def create_user(new_user: UserCreate, db: Session, password: UserPasswordUpdate = None) -> UserSchema:
+    # This is a UserPasswordUpdate, hashed up front by callers that keep bcrypt off the event loop
+    new_password = password or auth_service.create_salt_and_hashed_password(plaintext_password=new_user.password)
     db_item = models.User(e_number=new_user.e_number, hashed_password=new_password.password, salt=new_password.salt,
                           created_at=new_user.created_at, updated_at=new_user.updated_at)
     db.add(db_item)
@@ -0,0 +1,65 @@
+"""Runs bcrypt off the event loop on a bounded executor."""
+import asyncio
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette import status
+
+from app.core.config import settings
+
+
+class PasswordHasher:
+    """Executor for password hashing and verification.
+
+    bcrypt costs hundreds of milliseconds of CPU per call, so calls go to a
+    dedicated ``process`` or ``thread`` pool instead of the shared threadpool.
+    At most ``max_pending`` calls are queued or running per worker; beyond that
+    requests are rejected with 429 so a login burst cannot pile up unbounded
+    work and latency.
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown password hasher executor: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        # Created on first use so importing the app does not fork worker processes
+        if self._executor is None:
+            pool = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, function, *args, **kwargs):
+        """Awaits ``function(*args, **kwargs)`` on the executor, which needs it picklable for processes."""
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many concurrent password checks, try again later.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor,
+                                                                    partial(function, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            # ``cancel_futures`` is only available from Python 3.9
+            options = {"cancel_futures": True} if sys.version_info >= (3, 9) else {}
+            self._executor.shutdown(wait=False, **options)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASHER_EXECUTOR, settings.PASSWORD_HASHER_WORKERS,
+                                 settings.PASSWORD_HASHER_MAX_PENDING)
@@ -12,7 +12,7 @@ class RoleChecker:
     def __init__(self, allowed_roles: List = []):
         self.allowed_roles = allowed_roles
 
-    def __call__(self, user: UserSchema = Depends(get_current_active_user)):
+    async def __call__(self, user: UserSchema = Depends(get_current_active_user)):
         if user.is_admin:
             return
         if user.role not in self.allowed_roles: